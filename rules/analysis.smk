@@ -37,6 +37,20 @@ rule necessary_land_overview:
         )
 
 
+rule capacity_factors_demand:
+    message: "Determine capacity factors of demand of Europe, countries, and units of layer {wildcards.layer}."
+    input:
+        src = "src/capacity_factors_demand.py",
+        national_load = rules.electricity_load_national.output,
+        profiles = rules.demand_profiles.output,
+        demand = rules.demand.output
+    output:
+        "build/{layer}/capacity-factors-demand.txt"
+    conda: "../envs/default.yaml"
+    shell:
+        PYTHON + " {input.src} {input.national_load} {input.profiles} {input.demand} {output}"
+
+
 rule normed_potential_boxplots:
     message: "Plot ranges of relative potential for scenario {wildcards.scenario}."
     input:
@@ -4,11 +4,14 @@ This is based on simulations run based on input generated in the workflow `ninja
 that renewables.ninja simulations are not in the loop, i.e. they are not run automatically but must
 be run manually if they need to be altered.
 """
+from src.utils import apply_sub_scope
+
 PYTHON = "PYTHONPATH=./ python"
 PYTHON_SCRIPT = "PYTHONPATH=./ python {input} {output}"
 
 CONFIG_FILE = "config/default.yaml"
 configfile: CONFIG_FILE
+config.update(apply_sub_scope(config))
 
 
 rule capacityfactor_timeseries:
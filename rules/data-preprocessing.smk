@@ -1,6 +1,7 @@
 """This is a Snakemake file defining rules to retrieve raw data from online sources."""
-import pycountry
-from src.conversion import transform_bounds
+from pathlib import Path
+
+from src.conversion import transform_bounds, to_iso3
 
 URL_LOAD = "https://data.open-power-system-data.org/time_series/2018-06-30/time_series_60min_stacked.csv"
 URL_NUTS = "http://ec.europa.eu/eurostat/cache/GISCO/geodatafiles/NUTS_2013_01M_SH.zip"
@@ -44,16 +45,28 @@ rule raw_load:
         "curl -sLo {output} '{URL_LOAD}'"
 
 
+rule electricity_load_national:
+    message: "Extract hourly national load from raw load."
+    input:
+        src = "src/process_load.py",
+        load = rules.raw_load.output
+    output:
+        "build/electricity-load-national.parquet"
+    conda: "../envs/default.yaml"
+    shell:
+        PYTHON + " {input.src} profiles {input.load} {output} {CONFIG_FILE}"
+
+
 rule electricity_demand_national:
     message: "Determine yearly demand per country."
     input:
-        "src/process_load.py",
-        rules.raw_load.output
+        src = "src/process_load.py",
+        load = rules.electricity_load_national.output
     output:
         "build/electricity-demand-national.csv"
     conda: "../envs/default.yaml"
     shell:
-        PYTHON_SCRIPT_WITH_CONFIG
+        PYTHON + " {input.src} demand {input.load} {output}"
 
 
 rule raw_gadm_administrative_borders_zipped:
@@ -72,16 +85,22 @@ rule raw_gadm_administrative_borders:
 rule administrative_borders_gadm:
     message: "Merge administrative borders of all countries up to layer {params.max_layer_depth}."
     input:
-        "src/gadm.py",
-        ["data/automatic/raw-gadm/gadm36_{}.gpkg".format(country_code)
-            for country_code in [pycountry.countries.lookup(country).alpha_3
-                                 for country in config['scope']['countries']]
-         ]
+        src = "src/gadm.py",
+        geoparquet = "src/geoparquet.py",
+        countries = ["data/automatic/raw-gadm/gadm36_{}.gpkg".format(country_code)
+                     for country_code in to_iso3(config['scope']['countries'])]
     params: max_layer_depth = 3
-    output: "build/administrative-borders-gadm.gpkg"
+    output:
+        gpkg = "build/administrative-borders-gadm.gpkg",
+        parquet = "build/administrative-borders-gadm.parquet"
+    threads: config["snakemake"]["max-threads"]
     conda: "../envs/default.yaml"
     shell:
-        PYTHON + " {input} {params.max_layer_depth} {output} {CONFIG_FILE}"
+        """
+        {PYTHON} {input.src} {input.countries} {params.max_layer_depth} {output.gpkg} {CONFIG_FILE} \
+        --threads {threads}
+        {PYTHON} {input.geoparquet} {output.gpkg} {output.parquet}
+        """
 
 
 rule raw_nuts_units_zipped:
@@ -96,9 +115,11 @@ rule administrative_borders_nuts:
     message: "Normalise NUTS administrative borders."
     input:
         src = "src/nuts.py",
+        geoparquet = "src/geoparquet.py",
         zip = rules.raw_nuts_units_zipped.output
     output:
-        "build/administrative-borders-nuts.gpkg"
+        gpkg = "build/administrative-borders-nuts.gpkg",
+        parquet = "build/administrative-borders-nuts.parquet"
     shadow: "full"
     conda: "../envs/default.yaml"
     shell:
@@ -106,7 +127,8 @@ rule administrative_borders_nuts:
         unzip {input.zip} -d ./build
         {PYTHON} {input.src} merge ./build/NUTS_2013_01M_SH/data/NUTS_RG_01M_2013.shp \
         ./build/NUTS_2013_01M_SH/data/NUTS_AT_2013.dbf ./build/raw-nuts.gpkg
-        {PYTHON} {input.src} normalise ./build/raw-nuts.gpkg {output} {CONFIG_FILE}
+        {PYTHON} {input.src} normalise ./build/raw-nuts.gpkg {output.gpkg} {CONFIG_FILE}
+        {PYTHON} {input.geoparquet} {output.gpkg} {output.parquet}
         """
 
 
@@ -122,9 +144,11 @@ rule administrative_borders_lau:
     message: "Normalise LAU administrative borders."
     input:
         src = "src/lau.py",
+        geoparquet = "src/geoparquet.py",
         zip = rules.raw_lau_units_zipped.output
     output:
-        "build/administrative-borders-lau.geojson"
+        geojson = "build/administrative-borders-lau.geojson",
+        parquet = "build/administrative-borders-lau.parquet"
     shadow: "full"
     conda: "../envs/default.yaml"
     shell:
@@ -133,7 +157,8 @@ rule administrative_borders_lau:
         {PYTHON} {input.src} merge ./build/COMM_01M_2013_SH/data/COMM_RG_01M_2013.shp \
         ./build/COMM_01M_2013_SH/data/COMM_AT_2013.dbf ./build/raw-lau.gpkg
         {PYTHON} {input.src} identify ./build/raw-lau.gpkg ./build/raw-lau-identified.gpkg
-        {PYTHON} {input.src} normalise ./build/raw-lau-identified.gpkg {output} {CONFIG_FILE}
+        {PYTHON} {input.src} normalise ./build/raw-lau-identified.gpkg {output.geojson} {CONFIG_FILE}
+        {PYTHON} {input.geoparquet} {output.geojson} {output.parquet}
         """
 
 
@@ -205,33 +230,23 @@ rule raw_srtm_elevation_tile_zipped:
         """
 
 
-rule raw_srtm_elevation_tile:
-    message: "Unzip SRTM elevation data tile (x={wildcards.x}, y={wildcards.y})."
-    input:
-        "data/automatic/raw-srtm/srtm_{x}_{y}.zip"
-    output:
-        temp("build/srtm_{x}_{y}.tif")
-    run: # using Python here, because "unzip" issues a warning sometimes causing snakemake to break
-        import zipfile
-        from pathlib import Path
-
-        file_to_extract = Path(input[0]).with_suffix(".tif").name
-        with zipfile.ZipFile(input[0], "r") as zipref:
-            zipref.extract(file_to_extract, path="build")
-
-
 rule raw_srtm_elevation_data:
-    message: "Merge all SRTM elevation data tiles."
+    message: "Build a virtual mosaic of all SRTM elevation data tiles."
     input:
-        ["build/srtm_{x:02d}_{y:02d}.tif".format(x=x, y=y)
+        ["data/automatic/raw-srtm/srtm_{x:02d}_{y:02d}.zip".format(x=x, y=y)
          for x in range(SRTM_X_MIN, SRTM_X_MAX + 1)
          for y in range(SRTM_Y_MIN, SRTM_Y_MAX + 1)
          if not (x is 34 and y in [3, 4, 5, 6])] # these tiles do not exist
     output:
-        temp("build/raw-srtm-elevation-data.tif")
+        "build/raw-srtm-elevation-data.vrt"
+    params: # tiles are read from within their zip files, relative to the root of the repository
+        tiles = lambda wildcards, input: [
+            "/vsizip/{}/{}".format(Path(path).as_posix(), Path(path).with_suffix(".tif").name)
+            for path in input
+        ]
     conda: "../envs/default.yaml"
     shell:
-        "rio merge {input} {output} --overwrite"
+        "gdalbuildvrt -overwrite {output} {params.tiles}"
 
 
 rule raw_gmted_elevation_tile:
@@ -249,17 +264,17 @@ rule raw_gmted_elevation_tile:
 
 
 rule raw_gmted_elevation_data:
-    message: "Merge all GMTED elevation data tiles."
+    message: "Build a virtual mosaic of all GMTED elevation data tiles."
     input:
         ["data/automatic/raw-gmted/raw-gmted-{y}-{x}.tif".format(x=x, y=y)
          for x in GMTED_X
          for y in GMTED_Y
          ]
     output:
-        temp("build/raw-gmted-elevation-data.tif")
+        "build/raw-gmted-elevation-data.vrt"
     conda: "../envs/default.yaml"
     shell:
-        "rio merge {input} {output} --overwrite"
+        "gdalbuildvrt -overwrite {output} {input}"
 
 
 rule raw_bathymetry_zipped:
@@ -276,27 +291,27 @@ rule raw_bathymetry:
 
 
 rule elevation_in_europe:
-    message: "Merge SRTM and GMTED elevation data and warp/clip to Europe using {threads} threads."
+    message: "Build a virtual mosaic of SRTM and GMTED elevation data in Europe."
     input:
         gmted = rules.raw_gmted_elevation_data.output,
         srtm = rules.raw_srtm_elevation_data.output
     output:
-        temp("build/elevation-europe.tif")
+        srtm = "build/elevation-europe-srtm.vrt",
+        gmted = "build/elevation-europe-gmted.vrt",
+        mosaic = "build/elevation-europe.vrt"
     params:
-        srtm_bounds = "{x_min},{y_min},{x_max},60".format(**config["scope"]["bounds"]),
-        gmted_bounds = "{x_min},59.5,{x_max},{y_max}".format(**config["scope"]["bounds"])
-    threads: config["snakemake"]["max-threads"]
+        srtm_bounds = "{x_min} {y_min} {x_max} 60".format(**config["scope"]["bounds"]),
+        gmted_bounds = "{x_min} 59.5 {x_max} {y_max}".format(**config["scope"]["bounds"]),
+        bounds = "{x_min} {y_min} {x_max} {y_max}".format(**config["scope"]["bounds"])
     conda: "../envs/default.yaml"
     shell:
+        # Where both overlap, SRTM data is used, as sources listed last take precedence.
         """
-        rio clip --bounds {params.srtm_bounds} {input.srtm} -o build/tmp-srtm.tif
-        rio clip --bounds {params.gmted_bounds} {input.gmted} -o build/tmp-gmted.tif
-        rio warp build/tmp-gmted.tif -o build/tmp-gmted2.tif -r {RESOLUTION_SLOPE} \
-        --resampling nearest --threads {threads}
-        rio merge build/tmp-srtm.tif build/tmp-gmted2.tif {output}
-        rm build/tmp-gmted.tif
-        rm build/tmp-gmted2.tif
-        rm build/tmp-srtm.tif
+        gdalbuildvrt -overwrite -te {params.srtm_bounds} {output.srtm} {input.srtm}
+        gdalbuildvrt -overwrite -te {params.gmted_bounds} -tr {RESOLUTION_SLOPE} {RESOLUTION_SLOPE} \
+        -r nearest {output.gmted} {input.gmted}
+        gdalbuildvrt -overwrite -te {params.bounds} -tr {RESOLUTION_SLOPE} {RESOLUTION_SLOPE} \
+        {output.mosaic} {output.gmted} {output.srtm}
         """
 
 
@@ -310,21 +325,17 @@ rule land_cover_in_europe:
 
 
 rule slope_in_europe:
-    message: "Calculate slope and warp to resolution of study using {threads} threads."
+    message: "Calculate slope on the study grid using {threads} threads."
     input:
-        elevation = rules.elevation_in_europe.output,
+        src = "src/slope.py",
+        elevation = rules.elevation_in_europe.output.mosaic,
         land_cover = rules.land_cover_in_europe.output
     output:
         "build/slope-europe.tif"
     threads: config["snakemake"]["max-threads"]
     conda: "../envs/default.yaml"
     shell:
-        """
-        gdaldem slope -s 111120 -compute_edges {input.elevation} build/slope-temp.tif
-        rio warp build/slope-temp.tif -o {output} --like {input.land_cover} \
-        --resampling max --threads {threads}
-        rm build/slope-temp.tif
-        """
+        PYTHON + " {input.src} {input.elevation} {input.land_cover} {output} --threads {threads}"
 
 
 rule protected_areas_points_to_circles:
@@ -340,8 +351,9 @@ rule protected_areas_points_to_circles:
 
 
 rule protected_areas_in_europe:
-    message: "Rasterise protected areas data and clip to Europe."
+    message: "Rasterise IUCN categories of protected areas in Europe using {threads} threads."
     input:
+        src = "src/protected_areas.py",
         polygons = rules.raw_protected_areas.output.polygons,
         points = rules.protected_areas_points_to_circles.output,
         land_cover = rules.land_cover_in_europe.output
@@ -349,25 +361,17 @@ rule protected_areas_in_europe:
         "build/protected-areas-europe.tif"
     benchmark:
         "build/rasterisation-benchmark.txt"
-    params:
-        bounds = "{x_min},{y_min},{x_max},{y_max}".format(**config["scope"]["bounds"])
+    threads: config["snakemake"]["max-threads"]
     conda: "../envs/default.yaml"
     shell:
-        # The filter is in accordance to the way UNEP-WCMC calculates statistics:
-        # https://www.protectedplanet.net/c/calculating-protected-area-coverage
-        """
-        fio cat --rs --bbox {params.bounds} {input.polygons} {input.points} | \
-        fio filter "f.properties.STATUS in ['Designated', 'Inscribed', 'Established'] and \
-        f.properties.DESIG_ENG != 'UNESCO-MAB Biosphere Reserve'" | \
-        fio collect --record-buffered | \
-        rio rasterize --like {input.land_cover} \
-        --default-value 255 --all_touched -f "GTiff" --co dtype=uint8 -o {output}
-        """
+        PYTHON + " {input.src} {input.polygons} {input.points} {input.land_cover} {output} {CONFIG_FILE} "
+                 "--threads {threads}"
 
 
 rule settlements:
-    message: "Warp settlement data to CRS of study using {threads} threads."
+    message: "Aggregate settlement data and warp it to the study grid using {threads} threads."
     input:
+        src = "src/settlements.py",
         class50 = RAW_SETTLEMENT_DATA.format(esm_class="50"),
         class40 = RAW_SETTLEMENT_DATA.format(esm_class="40"),
         class41 = RAW_SETTLEMENT_DATA.format(esm_class="41"),
@@ -380,20 +384,12 @@ rule settlements:
         urban_greens = "build/esm-class404145-urban-greens.tif",
         built_up = "build/esm-class303550-built-up.tif"
     threads: config["snakemake"]["max-threads"]
-    shadow: "minimal"
     conda: "../envs/default.yaml"
     shell:
         """
-        rio calc "(+ (+ (read 1) (read 2)) (read 3))" \
-        {input.class40} {input.class41} {input.class45} -o build/esm-class404145-temp-not-warped.tif
-        rio calc "(+ (+ (read 1) (read 2)) (read 3))" \
-        {input.class50} {input.class30} {input.class35} -o build/esm-class303550-temp-not-warped.tif
-        rio warp {input.class50} -o {output.buildings} \
-        --like {input.reference} --threads {threads} --resampling bilinear
-        rio warp build/esm-class404145-temp-not-warped.tif -o {output.urban_greens} \
-        --like {input.reference} --threads {threads} --resampling bilinear
-        rio warp build/esm-class303550-temp-not-warped.tif -o {output.built_up} \
-        --like {input.reference} --threads {threads} --resampling bilinear
+        {PYTHON} {input.src} {input.class50} {input.class40} {input.class41} {input.class45} \
+        {input.class30} {input.class35} {input.reference} \
+        {output.buildings} {output.urban_greens} {output.built_up} --threads {threads}
         """
 
 
@@ -433,7 +429,7 @@ rule industry:
         "src/industry.py",
         RAW_INDUSTRY_DATA
     output:
-        "build/industrial-load.geojson"
+        "build/industrial-load.parquet"
     conda: "../envs/default.yaml"
     shell:
         PYTHON_SCRIPT
@@ -472,3 +468,16 @@ rule population_in_europe:
         """
         rio clip --geographic --bounds {params.bounds} --co compress=LZW {input.population} -o {output}
         """
+
+
+rule population_on_study_grid:
+    message: "Regrid population data to the study grid, preserving the population sum."
+    input:
+        src = "src/population.py",
+        population = rules.population_in_europe.output,
+        reference = rules.land_cover_in_europe.output
+    output:
+        "build/population-europe-study-grid.tif"
+    conda: "../envs/default.yaml"
+    shell:
+        PYTHON + " {input.src} regrid {input.population} {input.reference} {output}"
@@ -49,7 +49,7 @@ rule scenario_result:
                                       .set_index("unit_id"))
 
         def our_rating(technical_potential, technical_social_potential):
-            rating = pd.Series(index=technical_social_potential.index, data=None, dtype=pd.np.object)
+            rating = pd.Series(index=technical_social_potential.index, data=None, dtype=object)
             rating[technical_social_potential >= 1] = "is likely possible"
             rating[(technical_social_potential < 1)
                    & (technical_potential >= 2)] = "is maybe possible"
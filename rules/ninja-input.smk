@@ -3,11 +3,14 @@
 We create a raster grid on top of a map of Europe in order of running one (wind)
 or several (different roof configurations for pv) simulations per raster point.
 """
+from src.utils import apply_sub_scope
+
 PYTHON = "PYTHONPATH=./ python"
 PYTHON_SCRIPT = "PYTHONPATH=./ python {input} {output}"
 
 CONFIG_FILE = "config/default.yaml"
 configfile: CONFIG_FILE
+config.update(apply_sub_scope(config))
 
 include: "../Snakefile"
 include: "sonnendach.smk"
@@ -29,59 +29,54 @@ rule total_size_swiss_building_footprints_according_to_settlement_data:
     input:
         building_footprints = rules.settlements.output.buildings,
         eligibility = "build/technically-eligible-land.tif",
-        countries = rules.administrative_borders_nuts.output[0]
+        countries_raster = "build/national/units.tif",
+        country_attributes = "build/national/unit-attributes.csv"
     output:
         "build/building-footprints-according-to-settlement-data-km2.txt"
     run:
-        import rasterio
-        import fiona
-        from rasterstats import zonal_stats
         import pandas as pd
-        import geopandas as gpd
 
         from src.technical_eligibility import Eligibility
-        from src.conversion import area_in_squaremeters
-
-        with rasterio.open(input.eligibility, "r") as f_eligibility:
-            eligibility = f_eligibility.read(1)
-        with rasterio.open(input.building_footprints, "r") as f_building_share:
-            building_share = f_building_share.read(1)
-            transform = f_building_share.transform
+        from src.units_raster import NO_UNIT
+        from src.utils import read_window_of_unit
+
+        country_attributes = pd.read_csv(input.country_attributes, index_col="id")
+        swiss_label = country_attributes.index.get_loc("CHE") + NO_UNIT + 1
+        eligibility, _ = read_window_of_unit(input.eligibility, input.country_attributes, "CHE")
+        building_share, _ = read_window_of_unit(input.building_footprints, input.country_attributes, "CHE")
+        countries, _ = read_window_of_unit(input.countries_raster, input.country_attributes, "CHE")
         building_share[eligibility != Eligibility.ROOFTOP_PV] = 0
-
-        with fiona.open(input.countries, "r", layer="nuts0") as src:
-            zs = zonal_stats(
-                vectors=src,
-                raster=building_share,
-                affine=transform,
-                stats="mean",
-                nodata=-999
-            )
-            building_share = pd.Series(
-                index=[feat["properties"]["id"] for feat in src],
-                data=[stat["mean"] for stat in zs]
-            )
-        building_footprint_km2 = area_in_squaremeters(gpd.read_file(input.countries).set_index("id")).div(1e6) * building_share
-        swiss_building_footprint = building_footprint_km2.loc["CHE"]
+        swiss_building_share = building_share[countries == swiss_label].mean()
+        swiss_building_footprint = country_attributes.loc["CHE", "area_km2"] * swiss_building_share
         with open(output[0], "w") as f_out:
             f_out.write(f"{swiss_building_footprint}")
 
 
-rule correction_factor_building_footprint_to_available_rooftop:
-    message: "Determine the factor that maps from building footprints to available rooftop area for CHE."
-    input:
-        rooftops = rules.total_size_swiss_rooftops_according_to_sonnendach_data.output[0],
-        building_footprints = rules.total_size_swiss_building_footprints_according_to_settlement_data.output[0]
-    output:
-        "build/ratio-esm-available.txt"
-    run:
-        with open(input.rooftops, "r") as f_in:
-            rooftops = float(f_in.read())
-        with open(input.building_footprints, "r") as f_in:
-            building_footprints = float(f_in.read())
-        ratio = rooftops / building_footprints
-        with open(output[0], "w") as f_out:
-            f_out.write(f"{ratio:.3f}")
+if "Switzerland" in config["scope"]["countries"]:
+    rule correction_factor_building_footprint_to_available_rooftop:
+        message: "Determine the factor that maps from building footprints to available rooftop area for CHE."
+        input:
+            rooftops = rules.total_size_swiss_rooftops_according_to_sonnendach_data.output[0],
+            building_footprints = rules.total_size_swiss_building_footprints_according_to_settlement_data.output[0]
+        output:
+            "build/ratio-esm-available.txt"
+        run:
+            with open(input.rooftops, "r") as f_in:
+                rooftops = float(f_in.read())
+            with open(input.building_footprints, "r") as f_in:
+                building_footprints = float(f_in.read())
+            ratio = rooftops / building_footprints
+            with open(output[0], "w") as f_out:
+                f_out.write(f"{ratio:.3f}")
+else: # sub-scope without Switzerland
+    rule correction_factor_building_footprint_to_available_rooftop:
+        message: "Take the factor that maps from building footprints to available rooftop area from config."
+        output:
+            "build/ratio-esm-available.txt"
+        params: ratio = config["sub-scope"]["ratio-esm-available"]
+        run:
+            with open(output[0], "w") as f_out:
+                f_out.write(f"{params.ratio:.3f}")
 
 
 rule capacityfactor_of_technical_eligibility:
@@ -153,35 +148,56 @@ rule units:
     message: "Form units of layer {wildcards.layer} by remixing NUTS, LAU, and GADM."
     input:
         "src/units.py",
-        rules.administrative_borders_nuts.output,
-        rules.administrative_borders_lau.output,
-        rules.administrative_borders_gadm.output
+        rules.administrative_borders_nuts.output.parquet,
+        rules.administrative_borders_lau.output.parquet,
+        rules.administrative_borders_gadm.output.parquet
     output:
-        "build/{layer}/units.geojson"
+        geojson = "build/{layer}/units.geojson",
+        parquet = "build/{layer}/units.parquet"
+    threads: config["snakemake"]["max-threads"]
     conda: "../envs/default.yaml"
     shell:
-        PYTHON_SCRIPT + " {wildcards.layer} {CONFIG_FILE}"
+        PYTHON_SCRIPT + " {wildcards.layer} {CONFIG_FILE} --threads {threads}"
+
+
+rule units_raster:
+    message: "Rasterise units of layer {wildcards.layer} onto the study grid."
+    input:
+        "src/units_raster.py",
+        rules.units.output.parquet,
+        rules.land_cover_in_europe.output
+    output:
+        "build/{layer}/units.tif"
+    conda: "../envs/default.yaml"
+    shell:
+        PYTHON_SCRIPT
+
+
+rule unit_attributes:
+    message: "Determine area, bounds, and centroids of units of layer {wildcards.layer}."
+    input:
+        "src/unit_attributes.py",
+        rules.units.output.parquet,
+        rules.units_raster.output
+    output:
+        "build/{layer}/unit-attributes.csv"
+    conda: "../envs/default.yaml"
+    shell:
+        PYTHON_SCRIPT
 
 
 rule local_land_cover:
     message: "Land cover statistics per unit of layer {wildcards.layer}."
     input:
-        units = rules.units.output,
-        land_cover = rules.land_cover_in_europe.output,
-        src = "src/geojson_to_csv.py"
+        "src/land_cover.py",
+        rules.units.output.parquet,
+        rules.units_raster.output,
+        rules.land_cover_in_europe.output
     output:
         "build/{layer}/land-cover.csv"
     conda: "../envs/default.yaml"
     shell:
-        """
-        fio cat {input.units} | \
-        rio zonalstats -r {input.land_cover} --prefix 'lc_' --categorical | \
-        {PYTHON} {input.src} -a id -a lc_11 -a lc_14 -a lc_20 -a lc_30 -a lc_40 \
-        -a lc_50 -a lc_60 -a lc_70 -a lc_90 -a lc_100 -a lc_110 -a lc_120 -a lc_130 \
-        -a lc_140 -a lc_150 -a lc_160 -a lc_170 -a lc_180 -a lc_190 -a lc_200 \
-        -a lc_210 -a lc_220 -a lc_230 > \
-        {output}
-        """
+        PYTHON_SCRIPT
 
 
 rule local_built_up_area:
@@ -189,7 +205,7 @@ rule local_built_up_area:
     input:
         "src/built_up_area.py",
         rules.settlements.output.built_up,
-        rules.units.output
+        rules.units.output.parquet
     output:
         "build/{layer}/built-up-areas.csv"
     conda: "../envs/default.yaml"
@@ -200,38 +216,68 @@ rule local_built_up_area:
 rule population:
     message: "Allocate population to units of layer {wildcards.layer}."
     input:
-        units = rules.units.output,
-        population = rules.population_in_europe.output,
-        src_geojson = "src/geojson_to_csv.py",
-        src_population = "src/population.py",
+        src = "src/population.py",
+        units = rules.units.output.parquet,
+        unit_attributes = rules.unit_attributes.output,
+        units_raster = rules.units_raster.output,
+        population = rules.population_on_study_grid.output,
         land_cover = rules.local_land_cover.output
     output:
         "build/{layer}/population.csv"
     conda: "../envs/default.yaml"
     shell:
-        """
-        crs=$(rio info --crs {input.population})
-        fio cat --dst_crs "$crs" {input.units} | \
-        rio zonalstats -r {input.population} --prefix 'population_' --stats sum | \
-        {PYTHON} {input.src_geojson} -a id -a population_sum -a proper | \
-        {PYTHON} {input.src_population} {input.units} {input.land_cover} > \
-        {output}
-        """
+        PYTHON + " {input.src} allocate {input.units} {input.unit_attributes} {input.units_raster} "
+                 "{input.population} {input.land_cover} {output}"
+
+
+rule demand_on_study_grid:
+    message: "Break down national electricity demand to the study grid."
+    input:
+        src = "src/spatial_demand.py",
+        national_demand = rules.electricity_demand_national.output,
+        industry = rules.industry.output,
+        countries = "build/national/units.parquet",
+        countries_raster = "build/national/units.tif",
+        population = rules.population_on_study_grid.output,
+        land_cover = rules.land_cover_in_europe.output
+    output:
+        total = "build/electricity-demand-twh-per-year.tif",
+        industry = "build/electricity-demand-industry-twh-per-year.tif"
+    conda: "../envs/default.yaml"
+    shell:
+        PYTHON + " {input.src} raster {input.national_demand} {input.industry} {input.countries} "
+                 "{input.countries_raster} {input.population} {input.land_cover} {output.total} {output.industry}"
 
 
 rule demand:
     message: "Allocate electricity demand to units of layer {wildcards.layer}."
     input:
-        "src/spatial_demand.py",
-        rules.electricity_demand_national.output,
-        rules.industry.output,
-        rules.units.output,
-        rules.population.output
+        src = "src/spatial_demand.py",
+        units = rules.units.output.parquet,
+        units_raster = rules.units_raster.output,
+        total_demand = rules.demand_on_study_grid.output.total,
+        industrial_demand = rules.demand_on_study_grid.output.industry,
+        national_demand = rules.electricity_demand_national.output
     output:
         "build/{layer}/demand.csv"
     conda: "../envs/default.yaml"
     shell:
-        PYTHON_SCRIPT
+        PYTHON + " {input.src} allocate {input.units} {input.units_raster} {input.total_demand} "
+                 "{input.industrial_demand} {input.national_demand} {output}"
+
+
+rule demand_profiles:
+    message: "Break down hourly national load to units of layer {wildcards.layer}."
+    input:
+        src = "src/spatial_demand.py",
+        units = rules.units.output.parquet,
+        demand = rules.demand.output,
+        national_load = rules.electricity_load_national.output
+    output:
+        "build/{layer}/demand-profiles-mw.npy"
+    conda: "../envs/default.yaml"
+    shell:
+        PYTHON + " {input.src} profiles {input.units} {input.demand} {input.national_load} {output}"
 
 
 rule eez_eligibility:
@@ -253,10 +299,10 @@ rule shared_coast:
     message: "Determine share of coast length between eez and units of layer {wildcards.layer} using {threads} threads."
     input:
         "src/shared_coast.py",
-        rules.units.output,
+        rules.units.output.parquet,
         rules.eez_in_europe.output
     output:
-        "build/{layer}/shared-coast.csv"
+        "build/{layer}/shared-coast-sparse.csv"
     threads: config["snakemake"]["max-threads"]
     conda: "../envs/default.yaml"
     shell:
@@ -268,7 +314,7 @@ rule potentials:
         "Determine the constrained potentials for layer {wildcards.layer} in scenario {wildcards.scenario}."
     input:
         "src/potentials.py",
-        rules.units.output,
+        rules.units.output.parquet,
         rules.eez_in_europe.output,
         rules.shared_coast.output,
         rules.electricity_yield_of_technical_eligibility.output,
@@ -307,7 +353,7 @@ rule areas:
         "Determine eligible areas for layer {wildcards.layer} in scenario {wildcards.scenario}."
     input:
         "src/areas.py",
-        rules.units.output,
+        rules.units.output.parquet,
         rules.eez_in_europe.output,
         rules.shared_coast.output,
         rules.area_of_technical_eligibility.output,
@@ -326,7 +372,7 @@ rule capacities:
         "Determine installable capacities for layer {wildcards.layer} in scenario {wildcards.scenario}."
     input:
         "src/capacities.py",
-        rules.units.output,
+        rules.units.output.parquet,
         rules.eez_in_europe.output,
         rules.shared_coast.output,
         rules.capacity_of_technical_eligibility.output,
@@ -366,7 +412,7 @@ rule footprint:
         rules.electricity_yield_of_technical_eligibility.output,
         rules.land_cover_in_europe.output,
         rules.protected_areas_in_europe.output,
-        rules.units.output
+        rules.units.output.parquet
     output:
         "build/{layer}/{scenario}/footprint.csv"
     conda: "../envs/default.yaml"
@@ -383,7 +429,7 @@ rule necessary_land:
         rules.potentials.output,
         rules.footprint.output,
         rules.local_built_up_area.output,
-        rules.units.output
+        rules.units.output.parquet
     output:
         "build/{layer}/{scenario}/necessary-land-when-pv-{pvshare}%.csv"
     conda: "../envs/default.yaml"
@@ -394,7 +440,7 @@ rule necessary_land:
 rule scenario_results:
     message: "Merge all results of scenario {wildcards.scenario} for layer {wildcards.layer}."
     input:
-        units = rules.units.output,
+        units = rules.units.output.parquet,
         demand = rules.demand.output,
         population = rules.population.output,
         constrained_potentials = rules.potentials.output,
@@ -405,7 +451,7 @@ rule scenario_results:
         import pandas as pd
         import geopandas as gpd
 
-        gpd.read_file(input.units[0]).merge(
+        gpd.read_parquet(input.units).merge(
             pd.concat(
                 [pd.read_csv(path, index_col="id") for path in input[1:]],
                 axis=1
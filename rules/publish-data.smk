@@ -34,13 +34,32 @@ rule copy:
 
 rule units_without_geometry:
     message: "Remove shapes from units." # We are not allowed to redistribute those.
-    input: rules.units.output[0]
+    input: rules.units.output.parquet
     output: "build/publish/{layer}/units.csv"
     run:
+        import pyarrow.parquet as pq
         import pandas as pd
-        import geopandas as gpd
 
-        units = gpd.read_file(input[0]).set_index("id")
-        units = pd.DataFrame(units)
-        del units["geometry"]
+        columns = [column for column in pq.read_schema(input[0]).names if column != "geometry"]
+        units = pd.read_parquet(input[0], columns=columns).set_index("id")
         units.to_csv(output[0], index=True, header=True)
+
+
+rule shared_coast_dense:
+    message: "Expand shared coast of layer {wildcards.layer} to a table of all units and eezs."
+    input:
+        shared_coast = rules.shared_coast.output[0],
+        units = rules.units.output.parquet,
+        eez = rules.eez_in_europe.output[0]
+    output: "build/publish/{layer}/shared-coast.csv"
+    run:
+        import pandas as pd
+        import geopandas as gpd
+
+        unit_ids = pd.read_parquet(input.units, columns=["id"])["id"].astype(str)
+        eez_ids = gpd.read_file(input.eez)["MRGID"].astype(str)
+        shared_coast = pd.read_csv(input.shared_coast, dtype={"id": str, "eez": str})
+        shared_coast = shared_coast.pivot(index="id", columns="eez", values="share")
+        shared_coast = shared_coast.reindex(index=unit_ids, columns=eez_ids, fill_value=0.0).fillna(0.0)
+        shared_coast.index.name = "id"
+        shared_coast.to_csv(output[0], index=True, header=True)
@@ -11,12 +11,14 @@ This is in analogy to `potentials.py` but for areas [km2] instead of potentials
 import click
 import numpy as np
 import pandas as pd
+import geopandas as gpd
 import rasterio
 from rasterstats import zonal_stats
 import fiona
 
 from src.technical_eligibility import Eligibility, FOREST, FARM, OTHER
 from src.potentials import ProtectedArea
+from src.shared_coast import allocate_to_units
 from src.utils import Config
 
 
@@ -51,13 +53,12 @@ def areas(path_to_units, path_to_eez, path_to_shared_coast, path_to_eligible_are
         land_cover = src.read(1)
     with rasterio.open(path_to_protected_areas, "r") as src:
         protected_areas = src.read(1)
-    with fiona.open(path_to_units, "r") as src:
-        unit_ids = [feature["properties"]["id"] for feature in src]
-        unit_geometries = [feature["geometry"] for feature in src]
+    units = gpd.read_parquet(path_to_units, columns=["id", "geometry"])
+    unit_ids = units["id"].tolist()
+    unit_geometries = units.geometry.tolist()
     with fiona.open(path_to_eez, "r") as src:
         eez_ids = [feature["properties"]["id"] for feature in src]
         eez_geometries = [feature["geometry"] for feature in src]
-    shared_coasts = pd.read_csv(path_to_shared_coast, index_col=0)
 
     area_map = apply_scenario_config_to_areas(
         area_map=area_map,
@@ -99,7 +100,7 @@ def areas(path_to_units, path_to_eez, path_to_shared_coast, path_to_eligible_are
         }
     )
     offshore_areas = pd.DataFrame(
-        data=shared_coasts.dot(offshore_eez_areas),
+        data=allocate_to_units(path_to_shared_coast, offshore_eez_areas, unit_ids),
         columns=[cat.area_column_name for cat in Eligibility.offshore()]
     )
     areas = pd.concat([onshore_areas, offshore_areas], axis=1)
@@ -155,7 +156,7 @@ def apply_scenario_config_to_categories(category_map, land_cover, protected_area
     # protected-areas-used
     use_protected_areas = scenario_config["use-protected-areas"]
     if not use_protected_areas:
-        mask = (protected_areas == ProtectedArea.PROTECTED) & (category_map != Eligibility.ROOFTOP_PV)
+        mask = ProtectedArea.is_protected(protected_areas) & (category_map != Eligibility.ROOFTOP_PV)
         category_map[mask] = Eligibility.NOT_ELIGIBLE
 
     return category_map
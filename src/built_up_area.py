@@ -1,9 +1,9 @@
 """Determine the built up area in administrative units."""
 import click
-import fiona
 import rasterio
 from rasterstats import zonal_stats
 import pandas as pd
+import geopandas as gpd
 
 from src.utils import determine_pixel_areas
 
@@ -20,9 +20,9 @@ def built_up_areas(path_to_built_up_share, path_to_units, path_to_result):
         transform = src.transform
         bounds = src.bounds
         resolution = src.res[0]
-    with fiona.open(path_to_units, "r") as src:
-        unit_ids = [feature["properties"]["id"] for feature in src]
-        unit_geometries = [feature["geometry"] for feature in src]
+    units = gpd.read_parquet(path_to_units, columns=["id", "geometry"])
+    unit_ids = units["id"].tolist()
+    unit_geometries = units.geometry.tolist()
 
     pixel_area = determine_pixel_areas(crs, bounds, resolution)
     built_up_stats = pd.DataFrame(
@@ -11,10 +11,12 @@ rather than areas [km2] or [TWh/a].
 """
 import click
 import pandas as pd
+import geopandas as gpd
 import rasterio
 import fiona
 
 from src.potentials import Potential, apply_scenario_config, decide_between_pv_and_wind, potentials_per_shape
+from src.shared_coast import allocate_to_units
 from src.utils import Config
 
 
@@ -61,13 +63,12 @@ def potentials(path_to_units, path_to_eez, path_to_shared_coast,
         land_cover = src.read(1)
     with rasterio.open(path_to_protected_areas, "r") as src:
         protected_areas = src.read(1)
-    with fiona.open(path_to_units, "r") as src:
-        unit_ids = [feature["properties"]["id"] for feature in src]
-        unit_geometries = [feature["geometry"] for feature in src]
+    units = gpd.read_parquet(path_to_units, columns=["id", "geometry"])
+    unit_ids = units["id"].tolist()
+    unit_geometries = units.geometry.tolist()
     with fiona.open(path_to_eez, "r") as src:
         eez_ids = [feature["properties"]["id"] for feature in src]
         eez_geometries = [feature["geometry"] for feature in src]
-    shared_coasts = pd.read_csv(path_to_shared_coast, index_col=0)
 
     capacities_pv_prio, capacities_wind_prio = apply_scenario_config(
         potential_pv_prio=capacities_pv_prio,
@@ -122,7 +123,7 @@ def potentials(path_to_units, path_to_eez, path_to_shared_coast,
         }
     )
     offshore_potentials = pd.DataFrame(
-        data=shared_coasts.dot(offshore_eez_potentials),
+        data=allocate_to_units(path_to_shared_coast, offshore_eez_potentials, unit_ids),
         columns=[potential.capacity_name for potential in Potential.offshore()]
     )
     potentials = pd.concat([onshore_potentials, offshore_potentials], axis=1)
@@ -1,28 +1,47 @@
 """Determines capacity factors on different geographic scales."""
-from datetime import datetime
-
 import click
+import pandas as pd
 
-from src.process_load import read_load_profiles
+from src.spatial_demand import read_profiles, UNITS_PER_CHUNK
 
 
 @click.command()
-@click.argument("path_to_raw_load")
+@click.argument("path_to_national_load")
+@click.argument("path_to_unit_profiles")
+@click.argument("path_to_unit_demand")
 @click.argument("path_to_result")
-def capacity_factors(path_to_raw_load, path_to_result):
-    """Determines national and European global capacity factors."""
-    national = read_load_profiles(
-        path_to_raw_load,
-        start=datetime(2016, 1, 1),
-        end=datetime(2017, 1, 1)
-    )
+def capacity_factors(path_to_national_load, path_to_unit_profiles, path_to_unit_demand, path_to_result):
+    """Determines European global, national, and local capacity factors of demand.
+
+    National capacity factors are based on hourly national load, local capacity factors on
+    hourly load of the units of one layer.
+    """
+    national = pd.read_parquet(path_to_national_load)
     cap_factors = national.apply(capacity_factor, axis="index")
     global_cap_factor = capacity_factor(national.sum(axis="columns"))
     average_cap_factor = average_capacity_factor(cap_factors, national.sum(axis="index"))
+    local_cap_factors, local_demands = _local_capacity_factors(
+        read_profiles(path_to_unit_profiles, path_to_unit_demand, path_to_national_load)
+    )
+    average_local_cap_factor = average_capacity_factor(local_cap_factors, local_demands)
     with open(path_to_result, "w") as result_file:
         print("Global capacity factor: {:.2f}".format(global_cap_factor), file=result_file)
         print("Average national capacity factor: {:.2f}".format(average_cap_factor),
               file=result_file)
+        print("Average local capacity factor: {:.2f}".format(average_local_cap_factor),
+              file=result_file)
+
+
+def _local_capacity_factors(profiles):
+    # reads profiles chunk by chunk of units, as they may not fit into memory
+    cap_factors = []
+    demands = []
+    for start in range(0, profiles.sizes["id"], UNITS_PER_CHUNK):
+        chunk = profiles.isel(id=slice(start, start + UNITS_PER_CHUNK)).load()
+        cap_factors.append(chunk.mean("utc_timestamp") / chunk.max("utc_timestamp"))
+        demands.append(chunk.sum("utc_timestamp"))
+    return (pd.concat([cap_factor.to_series() for cap_factor in cap_factors]),
+            pd.concat([demand.to_series() for demand in demands]))
 
 
 def capacity_factor(time_series):
@@ -4,7 +4,7 @@ import numpy as np
 import geopandas as gpd
 import shapely
 
-from src.conversion import transform_bounds
+from src.conversion import transform_bounds, transform_points
 
 # from https://epsg.io/3035
 EPSG_3035 = "EPSG:3035"
@@ -20,6 +20,9 @@ def point_raster_on_shapes(bounds_wgs84, resolution_km2, shapes):
     Extends (=buffers) the shapes, so that whenever a raster cell is touched by any shape,
     a point is created for that cell.
 
+    The raster originates in the minimum of the corners of the bounds in EPSG:3035. This keeps
+    the points, and hence their ids, identical to those of earlier simulations.
+
     Parameters:
         * bounds_wgs84: the bounds of the point raster, given in WGS84
         * resolution_km2: the resolution of the point raster, given in km2
@@ -30,23 +33,21 @@ def point_raster_on_shapes(bounds_wgs84, resolution_km2, shapes):
     x_min, y_min, x_max, y_max = transform_bounds(
         bounds_wgs84["x_min"], bounds_wgs84["y_min"], bounds_wgs84["x_max"], bounds_wgs84["y_max"],
         from_epsg=WGS84,
-        to_epsg=EPSG_3035
+        to_epsg=EPSG_3035,
+        densify_points=0
+    )
+    xs, ys = np.meshgrid(
+        np.arange(start=x_min, stop=x_max, step=resolution_km2 * 1000),
+        np.arange(start=y_min, stop=y_max, step=resolution_km2 * 1000),
+        indexing="ij"
     )
-    all_points = [
-        shapely.geometry.Point(x, y)
-        for x in np.arange(start=x_min, stop=x_max, step=resolution_km2 * 1000)
-        for y in np.arange(start=y_min, stop=y_max, step=resolution_km2 * 1000)
-    ]
+    all_points = shapely.points(xs.ravel(), ys.ravel())
     simplification_strength = resolution_km2 * 1000 / 20
     buffer_size = math.sqrt(resolution_km2 ** 2 + resolution_km2 ** 2) / 2 * 1000
     surface_areas = (shapes.to_crs(EPSG_3035_PROJ4)
                            .simplify(simplification_strength)
                            .buffer(buffer_size))
-    prepared_polygons = [shapely.prepared.prep(polygon) for polygon in surface_areas.geometry]
-    return gpd.GeoSeries(
-        list(filter(
-            lambda point: any(polygon.intersects(point) for polygon in prepared_polygons),
-            all_points
-        )),
-        crs=EPSG_3035_PROJ4
-    ).to_crs(WGS84_PROJ4)
+    point_index, _ = surface_areas.sindex.query(all_points, predicate="intersects")
+    points = all_points[np.unique(point_index)]
+    xs, ys = transform_points(shapely.get_x(points), shapely.get_y(points), from_epsg=EPSG_3035, to_epsg=WGS84)
+    return gpd.GeoSeries(shapely.points(xs, ys), crs=WGS84_PROJ4)
@@ -9,14 +9,28 @@ def _set_proj_lib():
         raise ImportError(msg)
     os.environ["PROJ_LIB"] = path_to_projlib.as_posix()
 _set_proj_lib()
-from functools import partial
-from itertools import product
+from functools import lru_cache
+from types import MappingProxyType
 
+import numpy as np
+import pandas as pd
 import pycountry
-import shapely.geometry
-import shapely.ops
 import pyproj
 
+# the European Union uses its own country codes, which often but not always match ISO 3166
+EU_COUNTRY_CODES_TO_ISO2 = MappingProxyType({"el": "gr", "uk": "gb"})
+
+# coordinates look like "48°18'N 14°17'E", or "48.3N 14.283333E"; O is the German east
+_COORDINATE_PATTERN = (
+    r"(?P<{axis}_degrees>-?\d+(?:\.\d+)?)\s*"
+    r"(?:°\s*(?:(?P<{axis}_arcminutes>\d+(?:\.\d+)?)\s*')?\s*(?:(?P<{axis}_arcseconds>\d+(?:\.\d+)?)\s*\")?)?"
+    r"\s*(?P<{axis}_direction>{directions})"
+)
+_COORDINATES_PATTERN = r"^\s*{lat}\s*{long}\s*$".format(
+    lat=_COORDINATE_PATTERN.format(axis="lat", directions="[NS]"),
+    long=_COORDINATE_PATTERN.format(axis="long", directions="[EOW]")
+)
+
 # from https://epsg.io/3035
 EPSG_3035_PROJ4 = "+proj=laea +lat_0=52 +lon_0=10 +x_0=4321000 +y_0=3210000 +ellps=GRS80 +units=m +no_defs "
 
@@ -45,13 +59,48 @@ def eu_country_code_to_iso3(eu_country_code):
     The European Union uses its own country codes, which often but not always match ISO 3166.
     """
     assert len(eu_country_code) == 2, "EU country codes are of length 2, yours is '{}'.".format(eu_country_code)
-    if eu_country_code.lower() == "el":
-        iso2 = "gr"
-    elif eu_country_code.lower() == "uk":
-        iso2 = "gb"
-    else:
-        iso2 = eu_country_code
-    return pycountry.countries.lookup(iso2).alpha_3
+    return _country(eu_country_code).alpha_3
+
+
+def to_iso3(countries):
+    """Converts a Series of country names or codes to ISO 3166 alpha 3.
+
+    Missing values remain missing.
+    """
+    return _map_countries(countries, "alpha_3")
+
+
+def to_iso2(countries):
+    """Converts a Series of country names or codes to ISO 3166 alpha 2.
+
+    Missing values remain missing.
+    """
+    return _map_countries(countries, "alpha_2")
+
+
+def to_country_name(countries):
+    """Converts a Series of country names or codes to the ISO 3166 name.
+
+    Missing values remain missing.
+    """
+    return _map_countries(countries, "name")
+
+
+def _map_countries(countries, attribute):
+    # resolves each distinct country only once
+    countries = pd.Series(countries)
+    return countries.map({
+        country: getattr(_country(country), attribute) for country in countries.dropna().unique()
+    })
+
+
+@lru_cache(maxsize=None)
+def _country(country):
+    # pycountry's lookup scans all countries, hence each country is looked up only once: all
+    # conversions of countries in this module go through this cache
+    if not isinstance(country, str):
+        raise ValueError(f"Country must be given by name or code, not as {country!r}.")
+    return pycountry.countries.lookup(EU_COUNTRY_CODES_TO_ISO2.get(country.lower(), country))
 
 
 def coordinate_string_to_decimal(coordinate_string):
@@ -63,71 +112,69 @@ def coordinate_string_to_decimal(coordinate_string):
     The function would return the coordinates in decimal degrees easting and northing, so for
     the example given above that would be (14.283333, 48.300000).
     """
-    lat, long = _separate_lat_and_long(coordinate_string)
-    easting = _to_decimal_degree(*_split_coordinate(long))
-    northing = _to_decimal_degree(*_split_coordinate(lat))
-    return easting, northing
+    eastings, northings = coordinates_to_decimal(pd.Series([coordinate_string]))
+    return float(eastings[0]), float(northings[0])
+
+
+def coordinates_to_decimal(coordinate_strings):
+    """Converts a Series of coordinate strings to decimal coordinates in degrees.
+
+    All strings are parsed at once using a regular expression, see `coordinate_string_to_decimal`
+    for the format of each string.
+
+    Returns decimal coordinates as tuple of arrays: (eastings, northings).
+    """
+    normalised = (coordinate_strings.astype(str)
+                                    .str.replace("′", "'", regex=False)
+                                    .str.replace("″", '"', regex=False)
+                                    .str.replace(",", "", regex=False))
+    parts = normalised.str.extract(_COORDINATES_PATTERN)
+    invalid = parts["lat_degrees"].isnull()
+    assert not invalid.any(), f"Invalid coordinates: {coordinate_strings[invalid].tolist()}"
+    return _to_decimal_degrees(parts, "long"), _to_decimal_degrees(parts, "lat")
 
 
 def transform_coordinates(x, y, from_epsg, to_epsg):
     """Tranforms coordinates from one coordinate reference system to the other."""
-    point = shapely.geometry.Point(x, y)
+    xs, ys = transform_points([x], [y], from_epsg, to_epsg)
+    return float(xs[0]), float(ys[0])
 
-    project = partial(
-        pyproj.transform,
-        pyproj.Proj(init=from_epsg),
-        pyproj.Proj(init=to_epsg))
 
-    transformed_point = shapely.ops.transform(project, point)
-    return transformed_point.x, transformed_point.y
+def transform_points(xs, ys, from_epsg, to_epsg):
+    """Tranforms arrays of coordinates from one coordinate reference system to the other.
+
+    Returns transformed coordinates as tuple of arrays: (xs, ys).
+    """
+    return _transformer(from_epsg, to_epsg).transform(
+        np.asarray(xs, dtype=np.float64),
+        np.asarray(ys, dtype=np.float64)
+    )
 
 
-def transform_bounds(x_min, y_min, x_max, y_max, from_epsg, to_epsg):
+def transform_bounds(x_min, y_min, x_max, y_max, from_epsg, to_epsg, densify_points=21):
     """Tranforms bounds from one coordinate reference system to the other.
 
+    Edges of the bounds are not necessarily straight in the target coordinate reference system.
+    Hence, `densify_points` points are sampled along each edge, and the returned bounds contain
+    all of them and all corners.
+
     Returns bounds as tuple: (x_min, y_min, x_max, y_max).
     """
-    points = [transform_coordinates(x, y, from_epsg, to_epsg)
-              for x, y in product([x_min, x_max], [y_min, y_max])]
-
-    return (min([p[0] for p in points]), min([p[1] for p in points]),
-            max([p[0] for p in points]), max([p[1] for p in points]),)
-
-
-def _separate_lat_and_long(coordinate_string):
-    coordinate_string = coordinate_string.replace(",", "")
-    assert "N" in coordinate_string, coordinate_string
-    length_of_lat = coordinate_string.find("N") + 1
-    lat = coordinate_string[:length_of_lat].strip()
-    long = coordinate_string[length_of_lat:].strip()
-    assert lat[-1] == "N", lat
-    assert long[-1] in ["E", "O", "W"], long
-    return lat, long
-
-
-def _split_coordinate(coordinate_string):
-    coordinate_string = coordinate_string.replace("′", "'")
-    if "°" in coordinate_string: # coordinates are given in arcminutes
-        degrees, residual = coordinate_string.split("°")
-        if "'" in residual:
-            arcminutes, residual = residual.split("'")
-        else:
-            arcminutes = 0.0
-        if '"' in residual:
-            arcseconds, residual = residual.split('"')
-        else:
-            arcseconds = 0.0
-    else: # coordinates are given in decimals already
-        degrees = coordinate_string[:-1]
-        residual = coordinate_string[-1]
-        arcminutes = 0.0
-        arcseconds = 0.0
-    degrees, arcminutes, arcseconds = [float(value) for value in (degrees, arcminutes, arcseconds)]
-    if "W" in residual:
-        # longitude given in westings instead of eastings
-        degrees, arcminutes, arcseconds = [- value for value in (degrees, arcminutes, arcseconds)]
-    return degrees, arcminutes, arcseconds
-
-
-def _to_decimal_degree(degrees, arcminutes, arcseconds):
-    return degrees + arcminutes / 60 + arcseconds / 3600
\ No newline at end of file
+    return _transformer(from_epsg, to_epsg).transform_bounds(
+        x_min, y_min, x_max, y_max,
+        densify_pts=densify_points
+    )
+
+
+@lru_cache(maxsize=None)
+def _transformer(from_epsg, to_epsg):
+    # creating a transformer is expensive, hence each is created only once
+    return pyproj.Transformer.from_crs(from_epsg, to_epsg, always_xy=True)
+
+
+def _to_decimal_degrees(parts, axis):
+    degrees = parts[f"{axis}_degrees"].astype(np.float64)
+    arcminutes = parts[f"{axis}_arcminutes"].astype(np.float64).fillna(0.0)
+    arcseconds = parts[f"{axis}_arcseconds"].astype(np.float64).fillna(0.0)
+    sign = np.where(parts[f"{axis}_direction"].isin(["S", "W"]), -1.0, 1.0)
+    return (sign * (degrees + arcminutes / 60 + arcseconds / 3600)).values
@@ -4,13 +4,13 @@ This procedure is applied by the provider of the database, UNEP-WCMC, as well. S
 https://www.protectedplanet.net/c/calculating-protected-area-coverage
 or the manual of the database for further information.
 """
-import math
-
 import click
+import numpy as np
 import geopandas as gpd
-import pycountry
+import shapely
 
 from src.utils import Config
+from src.conversion import to_iso3
 
 # from https://epsg.io/3035
 EPSG_3035_PROJ4 = "+proj=laea +lat_0=52 +lon_0=10 +x_0=4321000 +y_0=3210000 +ellps=GRS80 +units=m +no_defs "
@@ -20,33 +20,45 @@ EPSG_3035_PROJ4 = "+proj=laea +lat_0=52 +lon_0=10 +x_0=4321000 +y_0=3210000 +ell
 @click.argument("path_to_input")
 @click.argument("path_to_output")
 @click.argument("config", type=Config())
-def estimate_shapes(path_to_input, path_to_output, config):
+@click.option("--quad-segments", default=16, type=click.INT,
+              help="Number of segments used to approximate a quarter circle.")
+def estimate_shapes(path_to_input, path_to_output, config, quad_segments):
     """Estimates the shap of protected areas for which only centroids are known."""
-    points = gpd.read_file(path_to_input)
-    points_in_scope = filter_points(points, config)
+    points_in_scope = read_points_in_scope(path_to_input, config)
     original_crs = points_in_scope.crs
-    # convert points to circles
-    points_in_scope = points_in_scope.to_crs(EPSG_3035_PROJ4)
-    points_in_scope.geometry = [rec[1].geometry.buffer(radius_meter(rec[1]["REP_AREA"]))
-                                for rec in points_in_scope.iterrows()]
-    test_area_size(points_in_scope)
-    points_in_scope.to_crs(original_crs).to_file(path_to_output, driver="GeoJSON")
+    circles = estimate_circles(points_in_scope, quad_segments)
+    test_area_size(circles)
+    circles.to_crs(original_crs).to_file(path_to_output, driver="GeoJSON")
+
+
+def read_points_in_scope(path_to_points, config):
+    """Reads only those points that lie within the bounds and countries of the scope.
+
+    Both filters are applied while reading, hence points out of scope are never loaded.
+    """
+    bounds = [config["scope"]["bounds"][z] for z in ["x_min", "y_min", "x_max", "y_max"]]
+    countries = ", ".join(f"'{iso3}'" for iso3 in to_iso3(config["scope"]["countries"]))
+    return gpd.read_file(
+        path_to_points,
+        bbox=tuple(bounds),
+        where=f"ISO3 IN ({countries}) AND REP_AREA > 0"
+    )
 
 
-def filter_points(points, config):
-    x_min, x_max, y_min, y_max = [config["scope"]["bounds"][z]
-                                  for z in ["x_min", "x_max", "y_min", "y_max"]]
-    countries = [pycountry.countries.lookup(country).alpha_3
-                 for country in config["scope"]["countries"]]
-    return points.cx[x_min:x_max, y_min:y_max].loc[
-        (points.ISO3.isin(countries)) &
-        (points.REP_AREA > 0)
-    ].copy()
+def estimate_circles(points, quad_segments):
+    """Converts points to circles of their reported area, in EPSG:3035."""
+    circles = points.to_crs(EPSG_3035_PROJ4)
+    circles.geometry = shapely.buffer(
+        circles.geometry.values,
+        radius_meter(circles["REP_AREA"].values),
+        quad_segs=quad_segments
+    )
+    return circles
 
 
 def radius_meter(area_squarekilometer):
-    area_squaremeter = area_squarekilometer * 1e6
-    return math.sqrt(area_squaremeter / math.pi)
+    area_squaremeter = np.asarray(area_squarekilometer) * 1e6
+    return np.sqrt(area_squaremeter / np.pi)
 
 
 def test_area_size(points):
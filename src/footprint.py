@@ -1,8 +1,8 @@
 """Determine the land footprint of the renewable potential in a given scenario."""
 import click
-import fiona
 import numpy as np
 import pandas as pd
+import geopandas as gpd
 import rasterio
 
 from src.utils import Config
@@ -39,9 +39,9 @@ def footprint(path_to_eligibility_categories, path_to_eligible_areas, path_to_el
         land_cover = src.read(1)
     with rasterio.open(path_to_protected_areas, "r") as src:
         protected_areas = src.read(1)
-    with fiona.open(path_to_units, "r") as src:
-        unit_ids = [feature["properties"]["id"] for feature in src]
-        unit_geometries = [feature["geometry"] for feature in src]
+    units = gpd.read_parquet(path_to_units, columns=["id", "geometry"])
+    unit_ids = units["id"].tolist()
+    unit_geometries = units.geometry.tolist()
 
     constrained_areas = _apply_scenario_config_to_area(
         eligible_areas=eligible_areas,
@@ -121,7 +121,7 @@ def _apply_scenario_config_to_area(eligible_areas, categories, land_cover, prote
     # share-protected-areas-used
     use_protected_areas = scenario_config["use-protected-areas"]
     if not use_protected_areas:
-        mask = (protected_areas == ProtectedArea.PROTECTED) & (categories != Eligibility.ROOFTOP_PV)
+        mask = ProtectedArea.is_protected(protected_areas) & (categories != Eligibility.ROOFTOP_PV)
         eligible_areas[mask] = 0
 
     return eligible_areas
@@ -1,28 +1,16 @@
 """Module to merge and preprocess GADM administrative borders."""
-from itertools import chain
+from multiprocessing import Pool
 
 import click
 import fiona
-import fiona.transform
+import numpy as np
 import geopandas as gpd
-import shapely.geometry
-from shapely.prepared import prep
+import shapely
 
 from src.utils import Config
 
+DRIVER = "GPKG"
 LAYER_NAME = "gadm{layer_id}"
-SCHEMA = {
-    "properties": {
-        "country_code": "str", # id of the country to which the unit belongs
-        "id": "str", # a unique id of this unit
-        "name": "str", # the name of the unit, not necessarily unqique
-        "type": "str", # the type of the unit
-        "proper": "int" # flag indicating proper administrative unit (not the case for water bodies e.g.)
-        # FIXME should be bool, but GeoPandas doesn't support bool: https://github.com/geopandas/geopandas/issues/437
-        # will be fixed here: https://github.com/geopandas/geopandas/pull/855
-    },
-    "geometry": "MultiPolygon"
-}
 
 
 @click.command()
@@ -30,104 +18,115 @@ SCHEMA = {
 @click.argument("max_layer_depths", type=click.INT)
 @click.argument("path_to_output")
 @click.argument("config", type=Config())
-def retrieve_administrative_borders(path_to_countries, max_layer_depths, path_to_output, config):
-    study_area = shapely.geometry.box(
-        minx=config["scope"]["bounds"]["x_min"],
-        maxx=config["scope"]["bounds"]["x_max"],
-        miny=config["scope"]["bounds"]["y_min"],
-        maxy=config["scope"]["bounds"]["y_max"]
-    )
-    study_area = prep(study_area) # improves performance
-    with fiona.open(path_to_countries[0], "r", layer=0) as first_country:
-        src_crs = first_country.crs
-        src_driver = first_country.driver
-    for layer_id in range(max_layer_depths + 1):
-        print(f"Merging layer {layer_id}...")
-        with fiona.open(path_to_output,
-                        "w",
-                        crs=config["crs"],
-                        schema=SCHEMA,
-                        driver=src_driver,
-                        layer=LAYER_NAME.format(layer_id=layer_id)) as merged_file:
-            merged_file.writerecords(
-                [_reproject(feature, src_crs, config["crs"]) for feature in chain(
-                    *[_country_features(path_to_country, layer_id, study_area)
-                      for path_to_country in path_to_countries])
-                 ]
-            )
+@click.option("--threads", default=1, type=click.INT, help="Number of countries processed in parallel.")
+def retrieve_administrative_borders(path_to_countries, max_layer_depths, path_to_output, config, threads):
+    """Merges the administrative borders of all countries, layer by layer.
+
+    Countries are processed in parallel. The results of each country are appended to the merged
+    layers as soon as they are available.
+    """
+    study_area = _study_area(config)
+    layer_ids = range(max_layer_depths + 1)
+    with Pool(threads) as pool:
+        country_layers = pool.imap(
+            _country_layers,
+            ((path_to_country, layer_ids, study_area, config["crs"]) for path_to_country in path_to_countries)
+        )
+        _write_layers(country_layers, layer_ids, path_to_output)
     _test_id_uniqueness(path_to_output)
 
 
-def _country_features(path_to_file, layer_id, study_area):
-    max_layer_id = int(sorted(fiona.listlayers(path_to_file))[-1][-1])
-    layer_id = min(layer_id, max_layer_id)
-    layer_name = fiona.listlayers(path_to_file)[0][:-1] + str(layer_id)
-    with fiona.open(path_to_file, "r", layer=layer_name) as country_file:
-        for feature in filter(_in_study_area(study_area), country_file):
-            new_feature = {}
-            new_feature["properties"] = {}
-            new_feature["properties"]["country_code"] = feature["properties"]["GID_0"]
-            new_feature["properties"]["id"] = feature["properties"][f"GID_{layer_id}"]
-            new_feature["properties"]["name"] = feature["properties"][f"NAME_{layer_id}"]
-            new_feature["properties"]["type"] = (
-                feature["properties"][f"ENGTYPE_{layer_id}"] if layer_id > 0
-                else "country"
+def _write_layers(country_layers, layer_ids, path_to_output):
+    # Each layer is created by the first country with units in it; empty layers cannot be written.
+    created_layers = set()
+    for layers in country_layers:
+        for layer_id, layer in zip(layer_ids, layers):
+            if layer.empty:
+                continue
+            layer_name = LAYER_NAME.format(layer_id=layer_id)
+            layer.to_file(
+                path_to_output,
+                driver=DRIVER,
+                layer=layer_name,
+                mode="a" if layer_name in created_layers else "w"
             )
-            new_feature["properties"]["proper"] = True
-            new_feature["geometry"] = _all_parts_in_study_area(feature, study_area)
-            yield new_feature
-
-
-def _in_study_area(study_area):
-    def _in_study_area(feature):
-        unit = shapely.geometry.shape(feature["geometry"])
-        if study_area.contains(unit) or study_area.intersects(unit):
-            return True
-        else:
-            print("Removing {} as it is outside of study area.".format(_feature_name(feature)))
-            return False
-    return _in_study_area
-
-
-def _all_parts_in_study_area(feature, study_area):
-    unit = _to_multi_polygon(feature["geometry"])
-    if not study_area.contains(unit):
-        print("Removing parts of {} outside of study area.".format(_feature_name(feature)))
-        new_unit = shapely.geometry.MultiPolygon([polygon for polygon in unit.geoms
-                                                  if study_area.contains(polygon)])
-        unit = new_unit
-    return shapely.geometry.mapping(unit)
-
-
-def _feature_name(feature):
-    # brute force way of finding name
-    # the problem is that the name of the feature depends on the layer
-    for property_name in ["NAME_7", "NAME_6", "NAME_5", "NAME_4", "NAME_3", "NAME_2", "NAME_1",
-                          "NAME_0"]:
-        try:
-            name = feature["properties"][property_name]
-            break
-        except KeyError:
-            pass # nothing to do here
-    return name
-
-
-def _reproject(feature, src_crs, dst_crs):
-    feature["geometry"] = fiona.transform.transform_geom(
-        src_crs=src_crs,
-        dst_crs=dst_crs,
-        geom=feature["geometry"]
+            created_layers.add(layer_name)
+
+
+def _country_layers(args):
+    # Reads each layer of the country only once, even if it is used for several layer depths,
+    # as the deepest layer of the country is used for all deeper layer depths.
+    path_to_file, layer_ids, study_area, crs = args
+    layer_names = fiona.listlayers(path_to_file)
+    max_layer_id = int(sorted(layer_names)[-1][-1])
+    source_layers = {}
+    country_layers = []
+    for layer_id in layer_ids:
+        layer_id = min(layer_id, max_layer_id)
+        if layer_id not in source_layers:
+            layer_name = layer_names[0][:-1] + str(layer_id)
+            source_layers[layer_id] = _country_layer(path_to_file, layer_name, layer_id, study_area, crs)
+        country_layers.append(source_layers[layer_id])
+    return country_layers
+
+
+def _country_layer(path_to_file, layer_name, layer_id, study_area, crs):
+    shapely.prepare(study_area) # preparation is lost when sent to worker processes
+    features = gpd.read_file(path_to_file, layer=layer_name, bbox=study_area.bounds)
+    in_study_area = shapely.intersects(features.geometry.values, study_area)
+    if not in_study_area.all():
+        print("Removing {} units of {} as they are outside of study area.".format(
+            (~in_study_area).sum(), layer_name
+        ))
+    features = features[in_study_area]
+    layer = gpd.GeoDataFrame(
+        {
+            "country_code": features["GID_0"].values,
+            "id": features[f"GID_{layer_id}"].values,
+            "name": features[f"NAME_{layer_id}"].values,
+            "type": features[f"ENGTYPE_{layer_id}"].values if layer_id > 0 else "country",
+            "proper": 1
+        },
+        geometry=_all_parts_in_study_area(features.geometry.values, study_area),
+        crs=features.crs
     )
-    return feature
+    return layer.to_crs(crs)
 
 
-def _to_multi_polygon(geometry):
-    if isinstance(geometry, dict):
-        geometry = shapely.geometry.shape(geometry)
-    if isinstance(geometry, shapely.geometry.polygon.Polygon):
-        return shapely.geometry.MultiPolygon(polygons=[geometry])
-    else:
-        return geometry
+def _study_area(config):
+    study_area = shapely.box(
+        xmin=config["scope"]["bounds"]["x_min"],
+        xmax=config["scope"]["bounds"]["x_max"],
+        ymin=config["scope"]["bounds"]["y_min"],
+        ymax=config["scope"]["bounds"]["y_max"]
+    )
+    shapely.prepare(study_area) # improves performance
+    return study_area
+
+
+def _all_parts_in_study_area(geometries, study_area):
+    """Returns multi polygons of only those polygons of each geometry that lie in the study area."""
+    parts, geometry_index = shapely.get_parts(geometries, return_index=True)
+    part_in_study_area = shapely.contains(study_area, parts)
+    incomplete = np.bincount(geometry_index[~part_in_study_area], minlength=len(geometries)) > 0
+    if incomplete.any():
+        print("Removing parts of {} units outside of study area.".format(incomplete.sum()))
+    return shapely.multipolygons(
+        parts[part_in_study_area],
+        indices=geometry_index[part_in_study_area],
+        out=np.full(len(geometries), shapely.MultiPolygon(), dtype=object)
+    )
+
+
+def _to_multi_polygons(geometries):
+    """Turns all polygons into multi polygons with a single part."""
+    geometries = np.array(geometries, dtype=object)
+    is_polygon = shapely.get_type_id(geometries) == shapely.GeometryType.POLYGON
+    geometries[is_polygon] = shapely.multipolygons(
+        geometries[is_polygon],
+        indices=np.arange(is_polygon.sum())
+    )
+    return geometries
 
 
 def _test_id_uniqueness(path_to_file):
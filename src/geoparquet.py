@@ -0,0 +1,35 @@
+"""Convert vector data to GeoParquet.
+
+GeoParquet is much faster to read than GeoJSON or GeoPackage. Its columns can be read
+individually, which allows to read attributes without decoding any geometry.
+"""
+import click
+import fiona
+import pandas as pd
+import geopandas as gpd
+
+LAYER_COLUMN = "layer"
+
+
+@click.command()
+@click.argument("path_to_input")
+@click.argument("path_to_output")
+def to_geoparquet(path_to_input, path_to_output):
+    """Converts all layers of a vector file into a single GeoParquet file.
+
+    The name of the original layer of each feature is kept in column `layer`.
+    """
+    layers = [
+        gpd.read_file(path_to_input, layer=layer_name).assign(**{LAYER_COLUMN: layer_name})
+        for layer_name in fiona.listlayers(path_to_input)
+    ]
+    crs = [layer.crs for layer in layers]
+    assert crs.count(crs[0]) == len(crs), "Layers have different crs. They must match."
+    gpd.GeoDataFrame(pd.concat(layers, ignore_index=True), crs=crs[0]).to_parquet(
+        path_to_output,
+        index=False
+    )
+
+
+if __name__ == "__main__":
+    to_geoparquet()
@@ -2,16 +2,15 @@
 import click
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import Point
 
-from src.conversion import coordinate_string_to_decimal
+from src.conversion import coordinates_to_decimal, to_iso3
 
 CRS = "+init=epsg:4326" # WGS84
-DRIVER = "GeoJSON"
-COLUMNS = ["Installation", "Type", "Average electricity cons (MW)", "Coordinates"]
-CHLORALKALI_COLUMNS = ["Company", "Average electricity cons (MW)", "Coordinates"]
+COLUMNS = ["Installation", "Country", "Type", "Average electricity cons (MW)", "Coordinates"]
+CHLORALKALI_COLUMNS = ["Company", "Country", "Average electricity cons (MW)", "Coordinates"]
 OUTPUT_COLUMNS = {
     "Installation": "installation",
+    "Country": "country_code",
     "Type": "type",
     "Average electricity cons (MW)": "average-load-mw"
 }
@@ -21,50 +20,43 @@ OUTPUT_COLUMNS = {
 @click.argument("path_to_raw_data")
 @click.argument("path_to_output")
 def preprocess_industries(path_to_raw_data, path_to_output):
-    """Preprocess raw industry data by creating a geo database of all plants."""
+    """Preprocess raw industry data by creating a geo database of all plants.
+
+    The database is stored as GeoParquet.
+    """
     industries = _read_raw_data(path_to_raw_data)
-    geometries = industries["Coordinates"].map(lambda coords: Point(*coordinate_string_to_decimal(coords)))
+    eastings, northings = coordinates_to_decimal(industries["Coordinates"])
+    industries["country_code"] = to_iso3(industries["country_code"]).values
     gdf = gpd.GeoDataFrame(
-        industries.drop("Coordinates", axis="columns"),
-        geometry=geometries,
+        industries.drop("Coordinates", axis="columns").reset_index(drop=True),
+        geometry=gpd.points_from_xy(eastings, northings),
         crs=CRS
     )
-    gdf.to_file(path_to_output, driver=DRIVER)
+    gdf.to_parquet(path_to_output)
 
 
 def _read_raw_data(path_to_raw_data):
-    steel = pd.read_excel(
-        path_to_raw_data,
-        sheetname="Total steel",
-        skipfooter=1
-    ).loc[:, COLUMNS]
-    primary_aluminium = pd.read_excel(
-        path_to_raw_data,
-        sheetname="Total aluminium",
-        skipfooter=27
-    ).loc[:, COLUMNS]
-    secondary_aluminium = pd.read_excel(
-        path_to_raw_data,
-        sheetname="Total aluminium",
-        skiprows=27,
-        skipfooter=1
-    ).loc[:, COLUMNS]
-    cement = pd.read_excel(
-        path_to_raw_data,
-        sheetname="Total cement",
-        skipfooter=1
-    ).loc[:, COLUMNS]
-    chloralkali = pd.read_excel(
-        path_to_raw_data,
-        sheetname="Total chloralkali",
-        skipfooter=1
-    ).loc[:, CHLORALKALI_COLUMNS]
+    with pd.ExcelFile(path_to_raw_data) as workbook: # reads the workbook only once
+        steel = workbook.parse("Total steel", skipfooter=1).loc[:, COLUMNS]
+        aluminium = workbook.parse("Total aluminium", header=None)
+        cement = workbook.parse("Total cement", skipfooter=1).loc[:, COLUMNS]
+        chloralkali = workbook.parse("Total chloralkali", skipfooter=1).loc[:, CHLORALKALI_COLUMNS]
+    primary_aluminium = _table(aluminium, header_row=0, last_row=len(aluminium.index) - 28)
+    secondary_aluminium = _table(aluminium, header_row=27, last_row=len(aluminium.index) - 2)
     chloralkali.rename(columns={"Company": "Installation"}, inplace=True)
     chloralkali["Type"] = "chloralkali"
     chloralkali.drop(21, axis="index", inplace=True)
-    return pd.concat([steel, primary_aluminium, secondary_aluminium, cement, chloralkali]).rename(
-        columns=OUTPUT_COLUMNS
-    )
+    industries = pd.concat([steel, primary_aluminium, secondary_aluminium, cement, chloralkali])
+    # some types are numbers in the raw data, but columnar formats need a single type per column
+    return industries.astype({"Installation": str, "Type": str}).rename(columns=OUTPUT_COLUMNS)
+
+
+def _table(sheet, header_row, last_row):
+    # the sheet of aluminium contains two tables, one for primary and one for secondary aluminium
+    table = sheet.iloc[header_row + 1:last_row + 1].copy()
+    table.columns = sheet.iloc[header_row]
+    table = table.loc[:, COLUMNS].reset_index(drop=True)
+    return table.astype({"Average electricity cons (MW)": "float64"})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,42 @@
+"""Determine land cover statistics per unit."""
+import click
+import pandas as pd
+
+from src.technical_eligibility import GlobCover
+from src.units_raster import categories_per_unit
+
+
+@click.command()
+@click.argument("path_to_units")
+@click.argument("path_to_units_raster")
+@click.argument("path_to_land_cover")
+@click.argument("path_to_result")
+@click.option("--area-weighted/--pixel-counts", default=False,
+              help="Determine areas [km2] instead of pixel counts.")
+def land_cover_statistics(path_to_units, path_to_units_raster, path_to_land_cover, path_to_result,
+                          area_weighted):
+    """Determine the number of pixels of each GlobCover land cover class per unit."""
+    unit_ids = pd.read_parquet(path_to_units, columns=["id"])["id"].tolist()
+    land_cover = pd.DataFrame(
+        index=unit_ids,
+        columns=[f"lc_{land_cover_class.value}" for land_cover_class in GlobCover],
+        data=categories_per_unit(
+            path_to_units_raster=path_to_units_raster,
+            path_to_categories=path_to_land_cover,
+            categories=[land_cover_class.value for land_cover_class in GlobCover],
+            number_units=len(unit_ids),
+            area_weighted=area_weighted
+        )
+    )
+    if not area_weighted:
+        land_cover = land_cover.astype(int)
+    land_cover.index.name = "id"
+    land_cover.to_csv(
+        path_to_result,
+        header=True,
+        index=True
+    )
+
+
+if __name__ == "__main__":
+    land_cover_statistics()
@@ -1,7 +1,6 @@
 """Determine the fration of non-built-up land area needed to become autarkic."""
 import click
 import pandas as pd
-import geopandas as gpd
 
 from src.potentials import Potential
 
@@ -29,7 +28,7 @@ def necessary_land(path_to_demand, path_to_potential, path_to_footprint, path_to
     potentials = pd.read_csv(path_to_potential, index_col=0)
     footprint = pd.read_csv(path_to_footprint, index_col=0)
     built_up_area = pd.read_csv(path_to_built_up_area, index_col=0)
-    country_codes = gpd.read_file(path_to_units).set_index("id")["country_code"]
+    country_codes = pd.read_parquet(path_to_units, columns=["id", "country_code"]).set_index("id")["country_code"]
 
     rooftop_pv = potentials[str(Potential.ROOFTOP_PV)].where(
         potentials[str(Potential.ROOFTOP_PV)] < share_from_pv * demand,
@@ -1,14 +1,10 @@
 """Preprocessing of raw NUTS data to bring it into normalised form."""
 import click
-import fiona
-import fiona.transform
-import shapely.geometry
 import geopandas as gpd
-import pandas as pd
-import pycountry
+import shapely
 
-from gadm import SCHEMA, _to_multi_polygon, _test_id_uniqueness
-from conversion import eu_country_code_to_iso3
+from gadm import _to_multi_polygons, _study_area, _all_parts_in_study_area, _test_id_uniqueness
+from conversion import to_iso3, to_country_name
 from utils import Config
 
 OUTPUT_DRIVER = "GPKG"
@@ -27,10 +23,8 @@ def nuts():
 def merge(path_to_shapes, path_to_attributes, path_to_output):
     """Merge NUTS shapes with attributes."""
     shapes = gpd.read_file(path_to_shapes)
-    shapes.geometry = shapes.geometry.map(_to_multi_polygon)
-    attributes = gpd.read_file(path_to_attributes)
-    attributes = pd.DataFrame(attributes) # to be able to remove geo information
-    del attributes["geometry"]
+    shapes.geometry = _to_multi_polygons(shapes.geometry.values)
+    attributes = gpd.read_file(path_to_attributes, ignore_geometry=True)
     shapes.merge(attributes, on="NUTS_ID", how="left").to_file(path_to_output, driver=OUTPUT_DRIVER)
 
 
@@ -45,94 +39,49 @@ def normalise(path_to_nuts, path_to_output, config):
     of this function corresponds to the form the data is used in this analysis,
     where each geographical layer is stored in one layer of a GeoPackage.
     """
-    with fiona.open(path_to_nuts, "r") as nuts_file:
-        for layer_id in range(4):
-            print("Building layer {}...".format(layer_id))
-            _write_layer(nuts_file, config, path_to_output, layer_id)
+    nuts_units = gpd.read_file(path_to_nuts)
+    country_codes = to_iso3(nuts_units["NUTS_ID"].str[:2])
+    nuts_units = nuts_units[_in_study_area(nuts_units, country_codes, config)]
+    for layer_id in range(4):
+        print("Building layer {}...".format(layer_id))
+        layer = _layer(nuts_units[nuts_units["STAT_LEVL_"] == layer_id], country_codes, layer_id, config)
+        layer.to_file(path_to_output, driver=OUTPUT_DRIVER, layer=LAYER_NAME.format(layer_id=layer_id))
     _test_id_uniqueness(path_to_output)
 
 
-def _write_layer(nuts_file, config, path_to_output, layer_id):
-    with fiona.open(path_to_output,
-                    "w",
-                    crs=config["crs"],
-                    schema=SCHEMA,
-                    driver=OUTPUT_DRIVER,
-                    layer=LAYER_NAME.format(layer_id=layer_id)) as result_file:
-        result_file.writerecords(_layer_features(nuts_file, config, layer_id))
-
-
-def _layer_features(nuts_file, config, layer_id):
-    for feature in filter(_in_layer_and_in_study_area(layer_id, config), nuts_file):
-        new_feature = {}
-        new_feature["properties"] = {}
-        new_feature["properties"]["country_code"] = eu_country_code_to_iso3(feature["properties"]["NUTS_ID"][:2])
-        new_feature["properties"]["id"] = feature["properties"]["NUTS_ID"]
-        new_feature["properties"]["name"] = feature["properties"]["NAME_LATN"]
-        new_feature["properties"]["type"] = "country" if layer_id == 0 else None
-        new_feature["properties"]["proper"] = True
-        new_feature["geometry"] = _all_parts_in_study_area_and_crs(feature, nuts_file.crs, config)
-        if layer_id == 0:
-            new_feature = _fix_country_feature(new_feature)
-        yield new_feature
-
-
-def _fix_country_feature(feature):
+def _layer(nuts_units, country_codes, layer_id, config):
+    layer = gpd.GeoDataFrame(
+        {
+            "country_code": country_codes[nuts_units.index].values,
+            "id": nuts_units["NUTS_ID"].values,
+            "name": nuts_units["NAME_LATN"].values,
+            "type": "country" if layer_id == 0 else None,
+            "proper": 1
+        },
+        geometry=_all_parts_in_study_area(nuts_units.geometry.values, _study_area(config)),
+        crs=nuts_units.crs
+    ).to_crs(config["crs"])
+    if layer_id == 0:
+        layer = _fix_country_layer(layer)
+    return layer
+
+
+def _fix_country_layer(layer):
     # * IDs should have three letters instead of two
     # * many country names are broken or missing
-    feature["properties"]["id"] = eu_country_code_to_iso3(feature["properties"]["id"])
-    feature["properties"]["name"] = pycountry.countries.lookup(feature["properties"]["id"]).name
-    return feature
-
-
-def _all_parts_in_study_area_and_crs(feature, src_crs, config):
-    study_area = _study_area(config)
-    unit = _to_multi_polygon(feature["geometry"])
-    if not study_area.contains(unit):
-        print("Removing parts of {} outside of study area.".format(feature["properties"]["NUTS_ID"]))
-        new_unit = shapely.geometry.MultiPolygon([polygon for polygon in unit.geoms
-                                                  if study_area.contains(polygon)])
-        unit = new_unit
-    geometry = shapely.geometry.mapping(unit)
-    return fiona.transform.transform_geom(
-        src_crs=src_crs,
-        dst_crs=config["crs"],
-        geom=geometry
-    )
-
-
-def _in_layer_and_in_study_area(layer_id, config):
-    def _in_layer_and_in_study_area(feature):
-        return _in_layer(layer_id, feature) and _in_study_area(config, feature)
-    return _in_layer_and_in_study_area
-
-
-def _in_layer(layer_id, feature):
-    if feature["properties"]["STAT_LEVL_"] == layer_id:
-        return True
-    else:
-        return False
-
-
-def _study_area(config):
-    return shapely.geometry.box(
-        minx=config["scope"]["bounds"]["x_min"],
-        maxx=config["scope"]["bounds"]["x_max"],
-        miny=config["scope"]["bounds"]["y_min"],
-        maxy=config["scope"]["bounds"]["y_max"]
-    )
-
-
-def _in_study_area(config, feature):
-    study_area = _study_area(config)
-    countries = [pycountry.countries.lookup(country) for country in config["scope"]["countries"]]
-    unit = shapely.geometry.shape(feature["geometry"])
-    country = pycountry.countries.lookup(eu_country_code_to_iso3(feature["properties"]["NUTS_ID"][:2]))
-    if (country in countries) and (study_area.contains(unit) or study_area.intersects(unit)):
-        return True
-    else:
-        print("Removing {} as it is outside of study area.".format(feature["properties"]["NUTS_ID"]))
-        return False
+    layer["id"] = to_iso3(layer["id"]).values
+    layer["name"] = to_country_name(layer["id"]).values
+    return layer
+
+
+def _in_study_area(units, country_codes, config):
+    """Returns a mask of all units of countries in scope and within the bounds of the study area."""
+    in_countries = country_codes[units.index].isin(to_iso3(config["scope"]["countries"])).values
+    in_bounds = shapely.intersects(units.geometry.values, _study_area(config))
+    outside = ~(in_countries & in_bounds)
+    if outside.any():
+        print("Removing {} units as they are outside of study area.".format(outside.sum()))
+    return ~outside
 
 
 if __name__ == "__main__":
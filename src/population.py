@@ -1,42 +1,158 @@
-"""Module to postprocess population data."""
+"""Module to regrid population data and to allocate it to units."""
+from pathlib import Path
+import tempfile
 import warnings
 
 import click
+import numpy as np
 import pandas as pd
-import geopandas as gpd
+import rasterio
+import rasterio.warp
+from rasterio.errors import WindowError
+from rasterio.transform import array_bounds
+from rasterio.warp import Resampling
+from rasterio.windows import Window, from_bounds, transform as window_transform
 
 from src.technical_eligibility import GlobCover
-from src.conversion import area_in_squaremeters
+from src.units_raster import sum_per_unit
+from src.utils import blocks
 
 WATER_THRESHOLD = 0.9 # units above this threshold are considered pure water bodies
 POPULATION_THRESHOLD = 0.001 # share of population that can be removed
+DTYPE = np.float32
+ROWS_PER_BLOCK = 128
 
 WATER = f"lc_{GlobCover.WATER_BODIES.value}"
 NOT_WATER = [f"lc_{x.value}" for x in GlobCover if x is not GlobCover.WATER_BODIES]
 
 
-@click.command()
+@click.group()
+def population():
+    pass
+
+
+@population.command()
+@click.argument("path_to_population")
+@click.argument("path_to_reference")
+@click.argument("path_to_output")
+def regrid(path_to_population, path_to_reference, path_to_output):
+    """Regrids population data to the grid of the reference raster, preserving its sum.
+
+    The population of each target pixel is the area weighted sum of the population of all
+    source pixels it overlaps: GDAL determines the area weighted average of the source pixels,
+    which is multiplied by the area of the target pixel, measured in source pixels.
+
+    GDAL approximates the footprints of target pixels. Hence, the regridded population is
+    rescaled to match the population of all source pixels whose centres lie within the study
+    grid exactly. The study grid is regridded and written block by block.
+    """
+    with rasterio.open(path_to_reference, "r") as src:
+        meta = src.meta
+    meta.update(dtype=DTYPE, nodata=None, count=1, compress="lzw")
+    with tempfile.TemporaryDirectory(dir=Path(path_to_output).parent) as tmpdir, \
+            rasterio.open(path_to_population, "r") as src:
+        path_to_unscaled = Path(tmpdir) / "unscaled.tif"
+        total_population = 0.0
+        population_in_grid = 0.0
+        for window in blocks(src, ROWS_PER_BLOCK):
+            population = src.read(1, window=window, masked=True).filled(0)
+            total_population += population.sum(dtype=np.float64)
+            population_in_grid += _population_in_grid(population, src.window_transform(window), src.crs, meta)
+        regridded_population = 0.0
+        with rasterio.open(path_to_unscaled, "w", **dict(meta, dtype=np.float64)) as dst:
+            for window in blocks(dst, ROWS_PER_BLOCK):
+                regridded = _regridded_block(src, window_transform(window, meta["transform"]),
+                                             window.height, window.width, meta["crs"])
+                regridded_population += regridded.sum()
+                dst.write(regridded, 1, window=window)
+        scale = population_in_grid / regridded_population if regridded_population > 0 else 0.0
+        print("Rescaling regridded population by {:.4f}% to preserve its sum.".format((scale - 1) * 100))
+        with rasterio.open(path_to_unscaled, "r") as unscaled, rasterio.open(path_to_output, "w", **meta) as dst:
+            for window in blocks(dst, ROWS_PER_BLOCK):
+                dst.write((unscaled.read(1, window=window) * scale).astype(DTYPE), 1, window=window)
+    print("{:.2f}% of the population lies outside of the study grid.".format(
+        (1 - population_in_grid / total_population) * 100
+    ))
+
+
+@population.command()
 @click.argument("path_to_units")
+@click.argument("path_to_unit_attributes")
+@click.argument("path_to_units_raster")
+@click.argument("path_to_population")
 @click.argument("path_to_land_cover_data")
-def postprocess_population(path_to_units, path_to_land_cover_data):
-    """Postprocesses population data.
+@click.argument("path_to_output")
+def allocate(path_to_units, path_to_unit_attributes, path_to_units_raster, path_to_population,
+             path_to_land_cover_data, path_to_output):
+    """Allocates population to units.
 
-    (1) Removes nans, which can occur when units are too small to cover a population raster.
+    (1) Sums up the population of the pixels of each unit.
     (2) Removes population living in water bodies.
     (3) Calculates population density.
-
-    Implemented as a filter which reads from stdin and writes to stdout.
     """
-    population = pd.read_csv(click.get_text_stream('stdin'), index_col="id")
-    population["population_sum"] = _fillna(population)
+    units = pd.read_parquet(path_to_units, columns=["id", "proper"]).set_index("id")
+    population = pd.DataFrame(
+        index=units.index,
+        data={
+            "population_sum": sum_per_unit(path_to_units_raster, path_to_population, len(units.index)),
+            "proper": units["proper"]
+        }
+    )
     population["population_sum"] = _remove_water_bodies(population, pd.read_csv(path_to_land_cover_data))
-    population["density_p_per_km2"] = _calculate_density(population, gpd.read_file(path_to_units).set_index("id"))
-    population[["population_sum", "density_p_per_km2"]].to_csv(click.get_text_stream('stdout'), header=True)
-
-
-def _fillna(population):
-    population["population_sum"] = pd.to_numeric(population["population_sum"], errors="coerce")
-    return population["population_sum"].fillna(0.0)
+    population["density_p_per_km2"] = _calculate_density(
+        population,
+        pd.read_csv(path_to_unit_attributes, index_col="id")
+    )
+    population[["population_sum", "density_p_per_km2"]].to_csv(path_to_output, header=True)
+
+
+def _regridded_block(src, dst_transform, height, width, dst_crs):
+    regridded = np.zeros((height, width), dtype=np.float64)
+    dst_bounds = array_bounds(height, width, dst_transform)
+    src_bounds = rasterio.warp.transform_bounds(dst_crs, src.crs, *dst_bounds, densify_pts=21)
+    window = from_bounds(*src_bounds, transform=src.transform).round_offsets(op="floor").round_lengths(op="ceil")
+    try:
+        window = Window(window.col_off - 1, window.row_off - 1, window.width + 2, window.height + 2).intersection(
+            Window(0, 0, src.width, src.height)
+        )
+    except WindowError: # block does not overlap the population data
+        return regridded
+    rasterio.warp.reproject(
+        source=src.read(1, window=window, masked=True).filled(0).astype(np.float64),
+        destination=regridded,
+        src_transform=src.window_transform(window),
+        src_crs=src.crs,
+        dst_transform=dst_transform,
+        dst_crs=dst_crs,
+        resampling=Resampling.average
+    )
+    return regridded * _pixel_areas(dst_transform, height, width, dst_crs, src.crs) / abs(src.res[0] * src.res[1])
+
+
+def _population_in_grid(population, transform, crs, grid_meta):
+    # population of all pixels whose centres lie within the grid
+    rows, cols = np.nonzero(population)
+    if rows.size == 0:
+        return 0.0
+    xs, ys = transform * (cols + 0.5, rows + 0.5)
+    xs, ys = rasterio.warp.transform(crs, grid_meta["crs"], xs, ys)
+    grid_cols, grid_rows = ~grid_meta["transform"] * (np.asarray(xs), np.asarray(ys))
+    in_grid = ((grid_cols >= 0) & (grid_cols < grid_meta["width"]) &
+               (grid_rows >= 0) & (grid_rows < grid_meta["height"]))
+    return population[rows[in_grid], cols[in_grid]].sum(dtype=np.float64)
+
+
+def _pixel_areas(transform, height, width, crs, area_crs):
+    # areas of all pixels, measured in area_crs, from the corners of the pixels (shoelace formula)
+    cols, rows = np.meshgrid(np.arange(width + 1), np.arange(height + 1))
+    xs, ys = transform * (cols.ravel(), rows.ravel())
+    xs, ys = rasterio.warp.transform(crs, area_crs, xs, ys)
+    xs = np.asarray(xs).reshape(height + 1, width + 1)
+    ys = np.asarray(ys).reshape(height + 1, width + 1)
+    return np.abs(
+        (xs[:-1, :-1] - xs[1:, 1:]) * (ys[:-1, 1:] - ys[1:, :-1]) -
+        (xs[:-1, 1:] - xs[1:, :-1]) * (ys[:-1, :-1] - ys[1:, 1:])
+    ) / 2
 
 
 def _remove_water_bodies(population, land_cover):
@@ -53,10 +169,9 @@ def _remove_water_bodies(population, land_cover):
     return data.set_index("id")["population_sum"]
 
 
-def _calculate_density(population, units):
-    area_in_km2 = area_in_squaremeters(units) / 1e6
-    return population["population_sum"] / area_in_km2
+def _calculate_density(population, unit_attributes):
+    return population["population_sum"] / unit_attributes["area_km2"].reindex(population.index)
 
 
 if __name__ == "__main__":
-    postprocess_population()
+    population()
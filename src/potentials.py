@@ -14,18 +14,47 @@ from enum import IntEnum, Enum
 import click
 import numpy as np
 import pandas as pd
+import geopandas as gpd
 import rasterio
 from rasterstats import zonal_stats
 import fiona
 
 from src.technical_eligibility import Eligibility, FOREST, FARM, OTHER
+from src.shared_coast import allocate_to_units
 from src.utils import Config
 
 
 class ProtectedArea(IntEnum):
-    """Derived from UNEP-WCMC data set."""
-    PROTECTED = 255
+    """Derived from UNEP-WCMC data set.
+
+    Protected areas are classified by their IUCN management category, from strictest to least strict.
+    """
     NOT_PROTECTED = 0
+    IUCN_IA = 1
+    IUCN_IB = 2
+    IUCN_II = 3
+    IUCN_III = 4
+    IUCN_IV = 5
+    IUCN_V = 6
+    IUCN_VI = 7
+    NOT_REPORTED = 8
+    NOT_APPLICABLE = 9
+    NOT_ASSIGNED = 10
+
+    @classmethod
+    def from_iucn_category(cls, iucn_category):
+        """Maps the IUCN category as named in the UNEP-WCMC data set."""
+        if iucn_category in ["Not Reported", "Not Applicable", "Not Assigned"]:
+            return cls["_".join(iucn_category.upper().split())]
+        elif iucn_category:
+            return cls[f"IUCN_{iucn_category.upper()}"]
+        else:
+            return cls.NOT_REPORTED
+
+    @classmethod
+    def is_protected(cls, protected_areas):
+        """Returns a mask of all protected pixels, independent of their category."""
+        return protected_areas != cls.NOT_PROTECTED
 
 
 class Potential(Enum):
@@ -109,13 +138,12 @@ def potentials(path_to_units, path_to_eez, path_to_shared_coast,
         land_cover = src.read(1)
     with rasterio.open(path_to_protected_areas, "r") as src:
         protected_areas = src.read(1)
-    with fiona.open(path_to_units, "r") as src:
-        unit_ids = [feature["properties"]["id"] for feature in src]
-        unit_geometries = [feature["geometry"] for feature in src]
+    units = gpd.read_parquet(path_to_units, columns=["id", "geometry"])
+    unit_ids = units["id"].tolist()
+    unit_geometries = units.geometry.tolist()
     with fiona.open(path_to_eez, "r") as src:
         eez_ids = [feature["properties"]["id"] for feature in src]
         eez_geometries = [feature["geometry"] for feature in src]
-    shared_coasts = pd.read_csv(path_to_shared_coast, index_col=0)
 
     electricity_yield_pv_prio, electricity_yield_wind_prio = apply_scenario_config(
         potential_pv_prio=electricity_yield_pv_prio,
@@ -162,7 +190,7 @@ def potentials(path_to_units, path_to_eez, path_to_shared_coast,
         }
     )
     offshore_potentials = pd.DataFrame(
-        data=shared_coasts.dot(offshore_eez_potentials),
+        data=allocate_to_units(path_to_shared_coast, offshore_eez_potentials, unit_ids),
         columns=Potential.offshore()
     )
     potentials = pd.concat([onshore_potentials, offshore_potentials], axis=1)
@@ -217,7 +245,7 @@ def apply_scenario_config(potential_pv_prio, potential_wind_prio, categories,
     # share-protected-areas-used
     use_protected_areas = scenario_config["use-protected-areas"]
     if not use_protected_areas:
-        mask = (protected_areas == ProtectedArea.PROTECTED) & (categories != Eligibility.ROOFTOP_PV)
+        mask = ProtectedArea.is_protected(protected_areas) & (categories != Eligibility.ROOFTOP_PV)
         potential_pv_prio[mask] = 0
         potential_wind_prio[mask] = 0
 
@@ -4,48 +4,95 @@ from datetime import timedelta, datetime
 import click
 import pandas as pd
 import numpy as np
-import pycountry
 
-from src.conversion import watt_to_watthours
+from src.conversion import watt_to_watthours, to_iso2, to_iso3, to_country_name
 from src.utils import Config
 
 
-@click.command()
+# The raw data is stacked: one row per region, variable, attribute, and timestamp.
+COLUMNS = ["region", "variable", "attribute", "utc_timestamp", "data"]
+DTYPES = {
+    "region": "category",
+    "variable": "category",
+    "attribute": "category",
+    "utc_timestamp": str,
+    "data": np.float64
+}
+NUMBER_ROWS = 10654293
+ROWS_PER_CHUNK = 1000000
+
+
+@click.group()
+def process_load():
+    pass
+
+
+@process_load.command()
 @click.argument('path_to_raw_load')
-@click.argument('path_to_output_data')
+@click.argument('path_to_output')
 @click.argument('config', type=Config())
-def process_data(path_to_raw_load, path_to_output_data, config):
-    """Extracts national energy demand 2017 from raw data."""
-    data = read_load_profiles(
+def profiles(path_to_raw_load, path_to_output, config):
+    """Extracts hourly national load 2017 [MW] from raw data.
+
+    The result is stored as Parquet, which is much faster to read than the raw data.
+    """
+    read_load_profiles(
         path_to_raw_load=path_to_raw_load,
         start=datetime(2017, 1, 1),
         end=datetime(2018, 1, 1),
-        country_codes_iso2=[pycountry.countries.lookup(country).alpha_2
-                            for country in config["scope"]["countries"]]
-    )
+        country_codes_iso2=to_iso2(config["scope"]["countries"]).tolist()
+    ).to_parquet(path_to_output)
+
+
+@process_load.command()
+@click.argument('path_to_load_profiles')
+@click.argument('path_to_output')
+def demand(path_to_load_profiles, path_to_output):
+    """Determines national energy demand [TWh/a] from hourly national load."""
+    data = pd.read_parquet(path_to_load_profiles)
     watt_to_watthours(data.mean(), timedelta(days=365)).div(1000).div(1000).to_csv(
-        path_to_output_data,
+        path_to_output,
         header=["twh_per_year"],
         index_label="country_code"
     )
 
 
 def read_load_profiles(path_to_raw_load, start, end, country_codes_iso2):
-    """Reads national load data and handles outliers."""
-    data = pd.read_csv(path_to_raw_load, nrows=10654293, parse_dates=[3])
-    data = data[(data["variable"] == "load")]
-    data = data[(data.utc_timestamp >= start) &
-                (data.utc_timestamp < end)]
+    """Reads national load data and handles outliers.
+
+    The raw data is read in chunks, and each chunk is reduced to the load of the given countries
+    and time span before the next one is read.
+    """
+    chunks = pd.read_csv(
+        path_to_raw_load,
+        usecols=COLUMNS,
+        dtype=DTYPES,
+        nrows=NUMBER_ROWS,
+        chunksize=ROWS_PER_CHUNK
+    )
+    data = pd.concat(
+        [_filter_chunk(chunk, start, end, country_codes_iso2) for chunk in chunks],
+        ignore_index=True
+    )
     data = _remove_entsoe_power_statistic_data_where_possible(data)
     data.drop(["variable", "attribute"], axis=1, inplace=True)
     data = data.pivot(columns="region", index="utc_timestamp", values="data")
     national = data.loc[:, country_codes_iso2].copy()
-    national.columns.name = "country_code"
-    national.rename(columns=lambda iso2: pycountry.countries.lookup(iso2).alpha_3, inplace=True)
+    national.columns = pd.Index(to_iso3(national.columns), name="country_code")
     _check_completeness(national)
     return _handle_outliers(national)
 
 
+def _filter_chunk(chunk, start, end, country_codes_iso2):
+    chunk = chunk[(chunk["variable"] == "load") & chunk["region"].isin(country_codes_iso2)].copy()
+    chunk["utc_timestamp"] = pd.to_datetime(chunk["utc_timestamp"], utc=True).dt.tz_localize(None)
+    chunk = chunk[(chunk["utc_timestamp"] >= start) & (chunk["utc_timestamp"] < end)]
+    for column in ["region", "variable", "attribute"]:
+        # categories differ between chunks, and would not survive concatenation anyway
+        chunk[column] = chunk[column].astype(str)
+    return chunk
+
+
 def _remove_entsoe_power_statistic_data_where_possible(load):
     sorted_load = load.sort_values(
         "attribute",
@@ -55,16 +102,16 @@ def _remove_entsoe_power_statistic_data_where_possible(load):
 
 
 def _check_completeness(load):
-    for country in load.columns[load.isnull().any()].tolist():
-        print("Country {} has missing load values.".format(pycountry.countries.lookup(country).name))
+    for country in to_country_name(load.columns[load.isnull().any()]):
+        print("Country {} has missing load values.".format(country))
 
 
 def _handle_outliers(all_time_series):
     # considers all data < 0.25 * mean and > 2 * mean invalid and replaces with last valid value
     normed_load = all_time_series / all_time_series.mean()
     all_time_series[(normed_load < 0.25) | (normed_load > 2)] = np.nan
-    return all_time_series.fillna(method="ffill")
+    return all_time_series.ffill()
 
 
 if __name__ == '__main__':
-    process_data()
+    process_load()
@@ -0,0 +1,133 @@
+"""Rasterise protected areas onto the study grid.
+
+Each pixel holds the IUCN category of the protected area it belongs to, see `ProtectedArea`.
+Where protected areas overlap, the strictest category wins. Keeping the categories allows
+scenarios to choose which protected areas to exclude without rasterising again.
+"""
+from itertools import islice
+from multiprocessing import Pool
+from pathlib import Path
+import tempfile
+
+import click
+import numpy as np
+import geopandas as gpd
+import shapely.geometry
+import fiona
+import rasterio
+from rasterio.features import rasterize
+from rasterio.windows import Window, bounds as window_bounds, transform as window_transform
+
+from src.potentials import ProtectedArea
+from src.utils import Config
+
+DTYPE = np.uint8
+TILE_SIZE = 1024 # pixels per row and column of each tile
+BATCH_SIZE = 10000 # protected areas read at once
+# The filter is in accordance to the way UNEP-WCMC calculates statistics:
+# https://www.protectedplanet.net/c/calculating-protected-area-coverage
+FILTER = ("STATUS IN ('Designated', 'Inscribed', 'Established') AND "
+          "(DESIG_ENG IS NULL OR DESIG_ENG <> 'UNESCO-MAB Biosphere Reserve')")
+
+CATEGORY = "category"
+
+
+@click.command()
+@click.argument("path_to_polygons")
+@click.argument("path_to_points_as_circles")
+@click.argument("path_to_reference")
+@click.argument("path_to_output")
+@click.argument("config", type=Config())
+@click.option("--threads", default=1, type=click.INT, help="Number of tiles rasterised in parallel.")
+def rasterise_protected_areas(path_to_polygons, path_to_points_as_circles, path_to_reference, path_to_output,
+                              config, threads):
+    """Rasterise protected areas onto the grid of the reference raster.
+
+    Protected areas are streamed from the polygons and the estimated circles of points, and are
+    filtered while reading. They are written to a temporary, spatially indexed GeoPackage. The
+    raster is created in tiles, and each worker reads only the protected areas intersecting its
+    tile from there. A pixel is protected when it touches a protected area.
+    """
+    with rasterio.open(path_to_reference, "r") as src:
+        meta = src.meta
+    bounds = [config["scope"]["bounds"][z] for z in ["x_min", "y_min", "x_max", "y_max"]]
+    meta.update(dtype=DTYPE, nodata=None, count=1, compress="lzw")
+    tiles = list(_tiles(meta["height"], meta["width"]))
+    with tempfile.TemporaryDirectory(dir=Path(path_to_output).parent) as tmpdir:
+        path_to_protected_areas = Path(tmpdir) / "protected-areas.gpkg"
+        _write_protected_areas([path_to_polygons, path_to_points_as_circles], bounds, meta["crs"],
+                               path_to_protected_areas)
+        with Pool(threads) as pool, rasterio.open(path_to_output, "w", **meta) as dst:
+            rasterised_tiles = pool.imap(
+                _rasterise_tile,
+                ((path_to_protected_areas, tile, window_transform(tile, meta["transform"]),
+                  window_bounds(tile, meta["transform"]))
+                 for tile in tiles)
+            )
+            for tile, data in zip(tiles, rasterised_tiles):
+                dst.write(data, 1, window=tile)
+
+
+def _protected_areas_in_batches(paths, bounds, crs):
+    """Yields all protected areas in bounds, batch by batch, with their categories."""
+    for path in paths:
+        with fiona.open(path, "r") as src:
+            # features are read lazily in batches; only their geometries and categories are kept
+            features = src.filter(bbox=bounds, where=FILTER)
+            for batch in iter(lambda: list(islice(features, BATCH_SIZE)), []):
+                yield gpd.GeoDataFrame(
+                    {CATEGORY: [ProtectedArea.from_iucn_category(feature["properties"]["IUCN_CAT"]).value
+                                for feature in batch]},
+                    geometry=[_to_multi_polygon(shapely.geometry.shape(feature["geometry"])) for feature in batch],
+                    crs=src.crs
+                ).to_crs(crs)
+
+
+def _to_multi_polygon(geometry):
+    # all batches are written to the same layer, which requires the same type of geometries
+    if isinstance(geometry, shapely.geometry.Polygon):
+        return shapely.geometry.MultiPolygon([geometry])
+    return geometry
+
+
+def _write_protected_areas(paths, bounds, crs, path_to_output):
+    # the GeoPackage is created with the first batch, hence it does not exist without protected areas
+    for batch in _protected_areas_in_batches(paths, bounds, crs):
+        batch.to_file(path_to_output, driver="GPKG", mode="a" if Path(path_to_output).exists() else "w")
+
+
+def _read_protected_areas(path, bounds):
+    """Returns all protected areas in bounds, ordered from the least to the strictest category."""
+    if not Path(path).exists():
+        return np.empty(0, dtype=object), np.empty(0, dtype=DTYPE)
+    protected_areas = gpd.read_file(path, bbox=tuple(bounds))
+    categories = protected_areas[CATEGORY].values.astype(DTYPE)
+    order = np.argsort(categories, kind="stable")[::-1] # later shapes overwrite earlier ones
+    return np.asarray(protected_areas.geometry.values[order], dtype=object), categories[order]
+
+
+def _tiles(height, width, tile_size=TILE_SIZE):
+    for row_off in range(0, height, tile_size):
+        for col_off in range(0, width, tile_size):
+            yield Window(col_off=col_off, row_off=row_off,
+                         width=min(tile_size, width - col_off),
+                         height=min(tile_size, height - row_off))
+
+
+def _rasterise_tile(args):
+    path_to_protected_areas, tile, transform, bounds = args
+    shapes, categories = _read_protected_areas(path_to_protected_areas, bounds)
+    if shapes.size == 0:
+        return np.full((tile.height, tile.width), ProtectedArea.NOT_PROTECTED, dtype=DTYPE)
+    return rasterize(
+        zip(shapes, categories.tolist()),
+        out_shape=(tile.height, tile.width),
+        transform=transform,
+        fill=ProtectedArea.NOT_PROTECTED,
+        all_touched=True,
+        dtype=DTYPE
+    )
+
+
+if __name__ == "__main__":
+    rasterise_protected_areas()
@@ -0,0 +1,139 @@
+"""Aggregate classes of the European Settlement Map (ESM) and warp them to the study grid.
+
+The ESM comes in one raster per class, each holding the share of the class in each pixel. The
+rasters are read window by window: for each tile of the study grid, all classes are read only
+once, the sums of classes are calculated in memory, and all sums are warped to the study grid.
+"""
+from multiprocessing import Pool
+
+import click
+import numpy as np
+import rasterio
+import rasterio.warp
+from rasterio.errors import WindowError
+from rasterio.warp import Resampling
+from rasterio.windows import Window, from_bounds, bounds as window_bounds, transform as window_transform
+
+DTYPE = np.float32
+TILE_SIZE = 256 # pixels per row and column of each tile of the study grid
+MARGIN = 8 # additional source pixels around each tile, covering the kernel of bilinear resampling
+
+BUILDINGS = [50]
+URBAN_GREENS = [40, 41, 45]
+BUILT_UP = [30, 35, 50]
+
+
+@click.command()
+@click.argument("path_to_class50")
+@click.argument("path_to_class40")
+@click.argument("path_to_class41")
+@click.argument("path_to_class45")
+@click.argument("path_to_class30")
+@click.argument("path_to_class35")
+@click.argument("path_to_reference")
+@click.argument("path_to_buildings")
+@click.argument("path_to_urban_greens")
+@click.argument("path_to_built_up")
+@click.option("--threads", default=1, type=click.INT, help="Number of tiles processed in parallel.")
+def settlements(path_to_class50, path_to_class40, path_to_class41, path_to_class45, path_to_class30,
+                path_to_class35, path_to_reference, path_to_buildings, path_to_urban_greens, path_to_built_up,
+                threads):
+    """Determine shares of buildings, urban greens, and built up area on the grid of the reference raster.
+
+    * buildings: ESM class 50,
+    * urban greens: sum of ESM classes 40, 41, and 45,
+    * built up area: sum of ESM classes 30, 35, and 50.
+
+    All shares are resampled bilinearly.
+    """
+    paths_to_classes = {
+        50: path_to_class50, 40: path_to_class40, 41: path_to_class41,
+        45: path_to_class45, 30: path_to_class30, 35: path_to_class35
+    }
+    with rasterio.open(path_to_reference, "r") as src:
+        meta = src.meta
+    with rasterio.open(path_to_class50, "r") as src:
+        nodata = src.nodata
+        scales = _scales(src, meta)
+    meta.update(dtype=DTYPE, nodata=nodata, count=1, compress="lzw")
+    tiles = list(_tiles(meta["height"], meta["width"], TILE_SIZE))
+    with Pool(threads) as pool, \
+            rasterio.open(path_to_buildings, "w", **meta) as f_buildings, \
+            rasterio.open(path_to_urban_greens, "w", **meta) as f_urban_greens, \
+            rasterio.open(path_to_built_up, "w", **meta) as f_built_up:
+        warped_tiles = pool.imap(
+            _warped_sums,
+            ((paths_to_classes, tile, window_transform(tile, meta["transform"]),
+              window_bounds(tile, meta["transform"]), meta["crs"], nodata, scales)
+             for tile in tiles)
+        )
+        for tile, (buildings, urban_greens, built_up) in zip(tiles, warped_tiles):
+            f_buildings.write(buildings, 1, window=tile)
+            f_urban_greens.write(urban_greens, 1, window=tile)
+            f_built_up.write(built_up, 1, window=tile)
+
+
+def _tiles(height, width, tile_size):
+    # square tiles keep the source window of each tile close to the size of the tile
+    for row_off in range(0, height, tile_size):
+        for col_off in range(0, width, tile_size):
+            yield Window(col_off=col_off, row_off=row_off,
+                         width=min(tile_size, width - col_off),
+                         height=min(tile_size, height - row_off))
+
+
+def _warped_sums(args):
+    paths_to_classes, tile, dst_transform, dst_bounds, dst_crs, nodata, (x_scale, y_scale) = args
+    fill_value = nodata if nodata is not None else 0
+    warped = np.full((3, tile.height, tile.width), fill_value, dtype=DTYPE)
+    classes = {}
+    for esm_class, path_to_class in paths_to_classes.items():
+        with rasterio.open(path_to_class, "r") as src:
+            window = _source_window(src, dst_bounds, dst_crs)
+            if window is None:
+                return tuple(warped)
+            classes[esm_class] = src.read(1, window=window, masked=True, out_dtype=DTYPE)
+            src_transform = src.window_transform(window)
+            src_crs = src.crs
+    sums = np.ma.stack([
+        np.ma.stack([classes[esm_class] for esm_class in aggregate]).sum(axis=0)
+        for aggregate in [BUILDINGS, URBAN_GREENS, BUILT_UP]
+    ])
+    rasterio.warp.reproject(
+        source=sums.filled(fill_value),
+        destination=warped,
+        src_transform=src_transform,
+        src_crs=src_crs,
+        src_nodata=nodata,
+        dst_transform=dst_transform,
+        dst_crs=dst_crs,
+        dst_nodata=nodata,
+        resampling=Resampling.bilinear,
+        XSCALE=x_scale,
+        YSCALE=y_scale
+    )
+    return tuple(warped)
+
+
+def _scales(src, dst_meta):
+    # GDAL scales the bilinear kernel when downsampling, by the ratio of the sizes of destination
+    # and source window. Using the ratio of the entire rasters makes results independent of tiles.
+    dst_bounds = window_bounds(Window(0, 0, dst_meta["width"], dst_meta["height"]), dst_meta["transform"])
+    window = _source_window(src, dst_bounds, dst_meta["crs"], margin=0)
+    return dst_meta["width"] / window.width, dst_meta["height"] / window.height
+
+
+def _source_window(src, dst_bounds, dst_crs, margin=MARGIN):
+    # the window of the source covering the tile, or None if they do not overlap
+    bounds = rasterio.warp.transform_bounds(dst_crs, src.crs, *dst_bounds, densify_pts=21)
+    window = from_bounds(*bounds, transform=src.transform).round_offsets(op="floor").round_lengths(op="ceil")
+    window = Window(window.col_off - margin, window.row_off - margin,
+                    window.width + 2 * margin, window.height + 2 * margin)
+    try:
+        return window.intersection(Window(0, 0, src.width, src.height))
+    except WindowError:
+        return None
+
+
+if __name__ == "__main__":
+    settlements()
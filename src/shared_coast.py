@@ -1,15 +1,18 @@
 """Module to Determine share of shared coast between eez and administrative units."""
-from textwrap import dedent
 from multiprocessing import Pool
-from itertools import cycle
 
 import click
 import numpy as np
 import pandas as pd
 import geopandas as gpd
+import shapely
 from shapely.prepared import prep
 
 DRIVER = "GeoJSON"
+COAST_TOLERANCE = 0.01 # degrees; unit outlines closer than this to the boundary of an eez are coast
+
+_UNITS = None # the units within each worker process, see `_init_worker`
+_OUTLINES = None # the exterior linework of the units within each worker process, if not exact
 
 
 @click.command()
@@ -17,55 +20,128 @@ DRIVER = "GeoJSON"
 @click.argument("path_to_eezs")
 @click.argument("path_to_output")
 @click.argument("threads", type=click.INT)
-def allocate_eezs(path_to_units, path_to_eezs, path_to_output, threads):
-    """Determine share of shared coast between eez and administrative units."""
-    units = gpd.read_file(path_to_units)
+@click.option("--exact/--linework", default=False,
+              help="Intersect eez and unit polygons exactly instead of using unit outlines.")
+def allocate_eezs(path_to_units, path_to_eezs, path_to_output, threads, exact):
+    """Determine share of shared coast between eez and administrative units.
+
+    By default, the coast shared between an eez and a unit is the exterior outline of the unit
+    that lies close to the boundary of the eez. With `--exact`, it is the perimeter of the
+    intersection of eez and unit, which is much slower but kept for validation. If no unit has
+    an outline close to the boundary of the eez, e.g. islands within it, the latter is used.
+
+    Fails for eezs that share no coast with any unit, as their data would be lost.
+    """
+    units = gpd.read_parquet(path_to_units)
     units.set_index("id", inplace=True)
     eezs = gpd.read_file(path_to_eezs)
-    with Pool(threads) as pool:
-        share_of_coast_length = pool.map(
+    outlines = None if exact else _exterior_outlines(units)
+    order = _order_by_estimated_cost(eezs)
+    with Pool(threads, initializer=_init_worker, initargs=(units, outlines)) as pool:
+        shares_in_order = pool.map(
             _share_of_coast_length,
-            zip((eez[1] for eez in eezs.iterrows()), cycle([units]))
+            (eezs.iloc[position] for position in order),
+            chunksize=1
         )
-    share = pd.DataFrame(
-        index=units.index,
-        data=dict(zip(eezs["MRGID"].values, share_of_coast_length))
-    )
-    assert (
-        ((share.sum() > 0.99) & (share.sum() < 1.01)) |
-        (share.sum() == 0.0)
-    ).all(), share.sum()
-    share.to_csv(path_to_output, header=True)
+    shared_coast = pd.concat([
+        pd.DataFrame({
+            "id": units.index[unit_positions],
+            "eez": eezs["MRGID"].iloc[position],
+            "share": share
+        })
+        for position, (unit_positions, share) in zip(order, shares_in_order)
+    ]).sort_values(["eez", "id"])
+    shared_coast = shared_coast[shared_coast["share"] > 0]
+    share_per_eez = shared_coast.groupby("eez")["share"].sum()
+    assert ((share_per_eez > 0.99) & (share_per_eez < 1.01)).all(), share_per_eez
+    shared_coast.to_csv(path_to_output, header=True, index=False)
+
+
+def allocate_to_units(path_to_shared_coast, eez_data, unit_ids):
+    """Allocates data of eezs to units based on the share of shared coast.
+
+    This is the product of the sparse (unit x eez) matrix of shares and the (eez x column) data,
+    which is calculated from the non-zero shares only.
+
+    Raises a ValueError if data of any eez would be lost, because it shares no coast with any unit.
+    """
+    shared_coast = pd.read_csv(path_to_shared_coast, dtype={"id": str, "eez": str})
+    eez_data = eez_data.rename(index=str)
+    assert shared_coast["eez"].isin(eez_data.index).all(), "Shared coast contains unknown eezs."
+    eezs_with_data = eez_data.index[(eez_data != 0).any(axis="columns")]
+    eezs_without_coast = eezs_with_data.difference(shared_coast.loc[shared_coast["share"] > 0, "eez"])
+    if not eezs_without_coast.empty:
+        raise ValueError("Eezs {} have non-zero data, but share no coast with any unit.".format(
+            ", ".join(eezs_without_coast)
+        ))
+    allocated = eez_data.reindex(shared_coast["eez"]).mul(shared_coast["share"].values, axis="index")
+    allocated.index = shared_coast["id"].values
+    return allocated.groupby(level=0).sum().reindex(unit_ids, fill_value=0.0)
+
 
+def _init_worker(units, outlines):
+    # units are sent to each worker only once, instead of once per eez
+    global _UNITS, _OUTLINES
+    _UNITS = units
+    _OUTLINES = outlines
+    _UNITS.sindex # build the spatial index once per worker
 
-def _share_of_coast_length(args):
+
+def _exterior_outlines(units):
+    """Returns the exterior rings of all parts of each unit, as one multi line string per unit."""
+    parts, unit_positions = shapely.get_parts(units.geometry.values, return_index=True)
+    outlines = shapely.multilinestrings(shapely.get_exterior_ring(parts), indices=unit_positions)
+    assert outlines.shape[0] == len(units.index), "Units must not be empty."
+    return outlines
+
+
+def _order_by_estimated_cost(eezs):
+    # Large eezs take longest. Starting with them avoids that they run last, on one thread only.
+    number_coordinates = shapely.get_num_coordinates(eezs.geometry.values)
+    return np.argsort(number_coordinates, kind="stable")[::-1]
+
+
+def _share_of_coast_length(eez):
+    # Returns the positions of units sharing coast with the eez, and their share of its coast.
+    #
     # How to determine the length of the shared coast?
-    # I intersect eez with the unit and determine the length of the resulting polygon.
-    # This approach is fairly rough, but accurate enough for this analysis.
-    eez = args[0]
-    units = args[1]
-    length_of_shared_coast = pd.Series(data=0.0, index=units.index, dtype=np.float32)
+    # I intersect the boundary of the eez, slightly buffered, with the outline of the unit and
+    # determine the length of the resulting lines. Buffering only the boundary is much cheaper
+    # than buffering the entire eez. With `--exact`, I intersect eez with the unit instead and
+    # determine the length of the resulting polygon. Both approaches are fairly rough, but
+    # accurate enough for this analysis.
+    units = _UNITS
+    candidates = units.sindex.query(eez["geometry"]) # units with intersecting bounding boxes
+    candidates = candidates[units["country_code"].iloc[candidates].isin([eez["ISO_Ter1"], "EUR"]).values]
     prep_eez = prep(eez["geometry"]) # increase performance
-    intersection_mask = ((units["country_code"].isin([eez["ISO_Ter1"], "EUR"])) &
-                         (units["geometry"].map(lambda unit: prep_eez.intersects(unit))))
-    if intersection_mask.sum() == 0:
-        msg = dedent("""No shared coast found for {}.
-        Ignoring eez with area {} km^2.""".format(
+    candidates = candidates[[prep_eez.intersects(unit) for unit in units["geometry"].iloc[candidates]]]
+    if candidates.size == 0:
+        # the data of the eez would be lost for all units otherwise, see `allocate_to_units`
+        raise ValueError("No shared coast found for {} with area {} km^2.".format(
             eez["GeoName"],
             eez["Area_km2"]
         ))
-        print(msg)
-        share = length_of_shared_coast.copy()
-    elif intersection_mask.sum() == 1:
+    elif candidates.size == 1:
         # performance improvement in cases where only one unit matches
-        share = length_of_shared_coast.copy()
-        share[intersection_mask] = 1
+        share = np.ones(1, dtype=np.float32)
     else:
-        length_of_shared_coast[intersection_mask] = units.loc[intersection_mask, "geometry"].map(
-            lambda unit: eez["geometry"].intersection(unit).length
-        )
+        length_of_shared_coast = _length_of_shared_coast(eez["geometry"], candidates)
+        if not length_of_shared_coast.sum() > 0:
+            raise ValueError("{} intersects units, but shares no coast with any of them.".format(eez["GeoName"]))
         share = length_of_shared_coast / length_of_shared_coast.sum()
-    return share
+    return candidates, share
+
+
+def _length_of_shared_coast(eez, candidates):
+    if _OUTLINES is not None:
+        coast = shapely.buffer(shapely.boundary(eez), COAST_TOLERANCE)
+        length = shapely.length(shapely.intersection(_OUTLINES[candidates], coast))
+        if length.sum() > 0:
+            return length.astype(np.float32)
+    return np.array(
+        [eez.intersection(unit).length for unit in _UNITS["geometry"].iloc[candidates]],
+        dtype=np.float32
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+"""Determine the slope of the terrain on the study grid.
+
+The slope is calculated from elevation data of higher resolution, and the maximum slope of all
+elevation pixels within a pixel of the study grid is kept. The calculation happens in square tiles
+of the study grid, hence the slope in the resolution of the elevation data is never stored.
+"""
+from multiprocessing import Pool
+
+import click
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+DTYPE = np.float32
+NODATA = -9999 # in analogy to gdaldem
+METERS_PER_DEGREE = 111120 # in analogy to `gdaldem slope -s 111120`
+TILE_SIZE = 256 # pixels per row and column of each tile of the study grid
+
+
+@click.command()
+@click.argument("path_to_elevation")
+@click.argument("path_to_reference")
+@click.argument("path_to_output")
+@click.option("--threads", default=1, type=click.INT, help="Number of tiles processed in parallel.")
+def slope(path_to_elevation, path_to_reference, path_to_output, threads):
+    """Determine the maximum slope [°] within each pixel of the reference raster.
+
+    The slope is derived with Horn's method, as in gdaldem. In contrast to gdaldem with a
+    constant scale, the east-west spacing of elevation pixels takes the latitude into account.
+    Each elevation pixel is assigned to the pixel of the reference raster containing its centre.
+    """
+    with rasterio.open(path_to_reference, "r") as src:
+        meta = src.meta
+    with rasterio.open(path_to_elevation, "r") as src:
+        assert src.crs == meta["crs"], "Elevation data must be in the coordinate reference system of the study."
+        target_rows = _target_indices(src.height, src.transform.f, src.transform.e, meta["transform"].f,
+                                      meta["transform"].e, meta["height"])
+        target_cols = _target_indices(src.width, src.transform.c, src.transform.a, meta["transform"].c,
+                                      meta["transform"].a, meta["width"])
+    meta.update(dtype=DTYPE, nodata=NODATA, count=1, compress="lzw")
+    tiles = list(_tiles(meta["height"], meta["width"], TILE_SIZE))
+    with Pool(threads) as pool, rasterio.open(path_to_output, "w", **meta) as dst:
+        slope_tiles = pool.imap(
+            _slope_of_tile,
+            ((path_to_elevation, tile, target_rows, target_cols) for tile in tiles)
+        )
+        for tile, slope_of_tile in zip(tiles, slope_tiles):
+            dst.write(slope_of_tile, 1, window=tile)
+
+
+def _tiles(height, width, tile_size):
+    # square tiles keep the source window of each tile close to the size of the tile
+    for row_off in range(0, height, tile_size):
+        for col_off in range(0, width, tile_size):
+            yield Window(col_off=col_off, row_off=row_off,
+                         width=min(tile_size, width - col_off),
+                         height=min(tile_size, height - row_off))
+
+
+def _target_indices(number_pixels, origin, resolution, target_origin, target_resolution, number_target_pixels):
+    # the index of the target pixel containing the centre of each source pixel along one axis,
+    # or -1 if the centre lies outside the target raster
+    centres = origin + (np.arange(number_pixels) + 0.5) * resolution
+    indices = np.floor((centres - target_origin) / target_resolution).astype(np.int64)
+    indices[(indices < 0) | (indices >= number_target_pixels)] = -1
+    return indices
+
+
+def _slope_of_tile(args):
+    path_to_elevation, tile, target_rows, target_cols = args
+    rows = np.flatnonzero((target_rows >= tile.row_off) & (target_rows < tile.row_off + tile.height))
+    cols = np.flatnonzero((target_cols >= tile.col_off) & (target_cols < tile.col_off + tile.width))
+    result = np.full((tile.height, tile.width), NODATA, dtype=DTYPE)
+    if rows.size == 0 or cols.size == 0:
+        return result
+    with rasterio.open(path_to_elevation, "r") as src:
+        # read a halo of one pixel on each side, as the slope depends on the neighbouring pixels
+        first_row, first_col = max(rows[0] - 1, 0), max(cols[0] - 1, 0)
+        last_row, last_col = min(rows[-1] + 2, src.height), min(cols[-1] + 2, src.width)
+        elevation = src.read(1, window=Window(first_col, first_row, last_col - first_col, last_row - first_row),
+                             masked=True, out_dtype=DTYPE)
+        pad_top, pad_left = 1 - (rows[0] - first_row), 1 - (cols[0] - first_col)
+        pad_bottom, pad_right = 1 - (last_row - rows[-1] - 1), 1 - (last_col - cols[-1] - 1)
+        latitudes = src.transform.f + (np.arange(rows[0], rows[-1] + 1) + 0.5) * src.transform.e
+        resolution = src.res
+    slope_of_pixels = _horn_slope(
+        np.pad(elevation.filled(np.nan), ((pad_top, pad_bottom), (pad_left, pad_right)), mode="edge"),
+        dx=(resolution[0] * METERS_PER_DEGREE * np.cos(np.deg2rad(latitudes))[:, np.newaxis]).astype(DTYPE),
+        dy=DTYPE(resolution[1] * METERS_PER_DEGREE)
+    )
+    # reduce to the maximum per target pixel, which are contiguous blocks of source pixels
+    row_starts = np.flatnonzero(np.diff(target_rows[rows], prepend=-1))
+    col_starts = np.flatnonzero(np.diff(target_cols[cols], prepend=-1))
+    with np.errstate(invalid="ignore"):
+        block_max = np.fmax.reduceat(np.fmax.reduceat(slope_of_pixels, row_starts, axis=0), col_starts, axis=1)
+    block_max[np.isnan(block_max)] = NODATA
+    result[np.ix_(target_rows[rows][row_starts] - tile.row_off,
+                  target_cols[cols][col_starts] - tile.col_off)] = block_max
+    return result
+
+
+def _horn_slope(elevation, dx, dy):
+    """Returns the slope [°] of all but the outermost pixels of the elevation data [m].
+
+    Pixels of which any neighbour has no data (NaN) have no slope (NaN).
+    """
+    a, b, c = elevation[:-2, :-2], elevation[:-2, 1:-1], elevation[:-2, 2:]
+    d, f = elevation[1:-1, :-2], elevation[1:-1, 2:]
+    g, h, i = elevation[2:, :-2], elevation[2:, 1:-1], elevation[2:, 2:]
+    dz_dx = ((c + 2 * f + i) - (a + 2 * d + g)) / (8 * dx)
+    dz_dy = ((g + 2 * h + i) - (a + 2 * b + c)) / (8 * dy)
+    return np.rad2deg(np.arctan(np.hypot(dz_dx, dz_dy))).astype(DTYPE)
+
+
+if __name__ == "__main__":
+    slope()
@@ -6,35 +6,129 @@ import click
 import numpy as np
 import pandas as pd
 import geopandas as gpd
+import rasterio
+from rasterio.transform import rowcol
+from rasterio.windows import Window
+import xarray as xr
 
 from src.conversion import watt_to_watthours
+from src.technical_eligibility import GlobCover
+from src.units_raster import sum_per_unit, NO_UNIT
+from src.utils import blocks
 
 ZERO_DEMAND = 0.000001
+DTYPE = np.float32
+MAX_DISTANCE_INDUSTRY_TO_UNIT = 0.1 # degrees
+UNITS_PER_CHUNK = 1024 # 1024 units x 8760 hours of float32 are about 36 MB
 
 
-@click.command()
+@click.group()
+def spatial_demand():
+    pass
+
+
+@spatial_demand.command()
 @click.argument("path_to_national_demand")
 @click.argument("path_to_industry_load")
-@click.argument("path_to_units")
+@click.argument("path_to_countries")
+@click.argument("path_to_countries_raster")
 @click.argument("path_to_population")
-@click.argument("path_to_results")
-def spatial_distribution(path_to_national_demand, path_to_industry_load, path_to_units,
-                         path_to_population, path_to_results):
-    """Breaks down national demand data to local level.
+@click.argument("path_to_land_cover")
+@click.argument("path_to_total_demand")
+@click.argument("path_to_industrial_demand")
+def raster(path_to_national_demand, path_to_industry_load, path_to_countries, path_to_countries_raster,
+           path_to_population, path_to_land_cover, path_to_total_demand, path_to_industrial_demand):
+    """Breaks down national demand data to the pixels of the study grid.
 
     This is done in two steps:
-        (1) allocating industrial demand to the units,
-        (2) allocating non-industrial demand proportional to population.
+        (1) allocating industrial demand to the pixel of each plant,
+        (2) allocating non-industrial demand proportional to gridded population.
+
+    Population on water bodies is ignored, as no one lives there.
+
+    Results are one raster of total demand and one of industrial demand only, both in [TWh/a].
     """
     total_demand = pd.read_csv(path_to_national_demand, index_col="country_code")
-    industries = gpd.read_file(path_to_industry_load)
+    countries = gpd.read_parquet(path_to_countries)
+    industries = gpd.read_parquet(path_to_industry_load)
+    industries = industries[industries["country_code"].isin(countries["country_code"])].copy() # e.g. in sub-scope
     industries["demand_twh_per_year"] = _determine_industry_demand(industries)
-    units = gpd.read_file(path_to_units)
-    units = units.merge(pd.read_csv(path_to_population), on='id')
 
-    local_industry_demand = _allocate_industry_demand_to_units(industries, units)
-    assert math.isclose(local_industry_demand.sum(), industries.demand_twh_per_year.sum())
-    local_non_industry_demand = _determine_non_industry_demand(total_demand, local_industry_demand, units)
+    industries["country_label"] = _match_industry_to_units(industries, countries) + NO_UNIT + 1
+    with rasterio.open(path_to_countries_raster, "r") as src:
+        meta = src.meta
+        industry_pixels = _pixels_of_industry(industries, src)
+    national_industry_demand = industries.groupby("country_label").demand_twh_per_year.sum().reindex(
+        np.arange(len(countries.index)) + NO_UNIT + 1, fill_value=0.0
+    ).values
+    national_non_industry_demand = (
+        total_demand["twh_per_year"].reindex(countries.country_code).values - national_industry_demand
+    )
+    assert not np.isnan(national_non_industry_demand).any(), "National demand is missing."
+    if (national_non_industry_demand < 0).any():
+        raise ValueError("Industrial demand exceeds national demand in {}.".format(
+            ", ".join(countries.country_code[national_non_industry_demand < 0])
+        ))
+    national_population = _population_per_country(
+        path_to_countries_raster, path_to_population, path_to_land_cover, len(countries.index)
+    )
+    assert (national_population[national_non_industry_demand > 0] > 0).all(), "Population is missing."
+    non_industry_demand_per_person = np.zeros(len(countries.index) + NO_UNIT + 1, dtype=np.float64)
+    non_industry_demand_per_person[NO_UNIT + 1:] = np.divide(
+        national_non_industry_demand,
+        national_population,
+        out=np.zeros_like(national_non_industry_demand),
+        where=national_population > 0
+    )
+
+    meta.update(dtype=DTYPE, nodata=None, count=1, compress="lzw")
+    sum_of_total_demand = 0.0
+    with rasterio.open(path_to_countries_raster, "r") as f_countries, \
+            rasterio.open(path_to_population, "r") as f_population, \
+            rasterio.open(path_to_land_cover, "r") as f_land_cover, \
+            rasterio.open(path_to_total_demand, "w", **meta) as f_total, \
+            rasterio.open(path_to_industrial_demand, "w", **meta) as f_industry:
+        for window in blocks(f_countries):
+            countries_in_window = f_countries.read(1, window=window)
+            population = _population_on_land(f_population, f_land_cover, window)
+            industry = _industry_in_window(industry_pixels, window)
+            total = non_industry_demand_per_person[countries_in_window] * population + industry
+            sum_of_total_demand += total.sum()
+            f_total.write(total.astype(DTYPE), 1, window=window)
+            f_industry.write(industry.astype(DTYPE), 1, window=window)
+    expected_demand = total_demand["twh_per_year"].reindex(countries.country_code).sum()
+    assert math.isclose(sum_of_total_demand, expected_demand, rel_tol=1e-6), sum_of_total_demand
+
+
+@spatial_demand.command()
+@click.argument("path_to_units")
+@click.argument("path_to_units_raster")
+@click.argument("path_to_total_demand")
+@click.argument("path_to_industrial_demand")
+@click.argument("path_to_national_demand")
+@click.argument("path_to_results")
+def allocate(path_to_units, path_to_units_raster, path_to_total_demand, path_to_industrial_demand,
+             path_to_national_demand, path_to_results):
+    """Allocates electricity demand to units by aggregating the demand rasters.
+
+    The borders of units in a layer may not perfectly match the national borders used to create
+    the demand rasters. Therefore, non-industrial demand is rescaled per country to match
+    national demand exactly.
+    """
+    total_demand = pd.read_csv(path_to_national_demand, index_col="country_code")
+    units = pd.read_parquet(path_to_units, columns=["id", "country_code"])
+    local_total_demand = sum_per_unit(path_to_units_raster, path_to_total_demand, len(units.index))
+    local_industry_demand = pd.Series(
+        sum_per_unit(path_to_units_raster, path_to_industrial_demand, len(units.index)),
+        index=units.index
+    )
+    local_non_industry_demand = pd.Series(local_total_demand, index=units.index) - local_industry_demand
+    local_non_industry_demand = _match_national_demand(
+        local_non_industry_demand.clip(lower=0),
+        local_industry_demand,
+        units,
+        total_demand
+    )
     units["demand_twh_per_year"] = local_industry_demand + local_non_industry_demand
     units["industrial_demand_fraction"] = local_industry_demand / units["demand_twh_per_year"]
     assert math.isclose(units["demand_twh_per_year"].sum(), total_demand["twh_per_year"].sum())
@@ -44,48 +138,209 @@ def spatial_distribution(path_to_national_demand, path_to_industry_load, path_to
     )
 
 
+@spatial_demand.command()
+@click.argument("path_to_units")
+@click.argument("path_to_unit_demand")
+@click.argument("path_to_national_load")
+@click.argument("path_to_results")
+def profiles(path_to_units, path_to_unit_demand, path_to_national_load, path_to_results):
+    """Breaks down hourly national load to hourly load of units [MW].
+
+    Industrial demand of each unit is a flat load. Non-industrial demand of each unit follows the
+    hourly national load without national industrial demand.
+
+    Results are an array of shape (units, hours) in the order of the units file, stored in the
+    `.npy` format. Units are written chunk by chunk, so that the array is never held in memory
+    entirely. Read results using `read_profiles`.
+    """
+    units = pd.read_parquet(path_to_units, columns=["id", "country_code"])
+    demand = pd.read_csv(path_to_unit_demand, index_col="id").reindex(units["id"])
+    assert not demand["demand_twh_per_year"].isnull().any(), "Demand of units is missing."
+    national_load = pd.read_parquet(path_to_national_load)
+    national_load["EUR"] = national_load.sum(axis=1) # special case for continental level
+
+    hours = len(national_load.index)
+    average_load_mw = demand["demand_twh_per_year"].values * 1e6 / hours
+    industry_load_mw = average_load_mw * demand["industrial_demand_fraction"].fillna(0.0).values
+    non_industry_load_mw = average_load_mw - industry_load_mw
+    countries = pd.Index(units["country_code"].unique())
+    shapes = _non_industry_load_shapes(national_load, industry_load_mw, units["country_code"], countries)
+    country_of_unit = countries.get_indexer(units["country_code"])
+
+    results = np.lib.format.open_memmap(path_to_results, mode="w+", dtype=DTYPE, shape=(len(units.index), hours))
+    for start in range(0, len(units.index), UNITS_PER_CHUNK):
+        chunk = slice(start, start + UNITS_PER_CHUNK)
+        results[chunk] = (
+            industry_load_mw[chunk, np.newaxis] +
+            non_industry_load_mw[chunk, np.newaxis] * shapes[country_of_unit[chunk]]
+        )
+    results.flush()
+
+
+def read_profiles(path_to_profiles, path_to_unit_demand, path_to_national_load):
+    """Reads hourly load of units [MW] lazily.
+
+    Returns a DataArray with dimensions `id` and `utc_timestamp`, backed by a memory map. Only the
+    units and hours selected from it are read from disk.
+    """
+    return xr.DataArray(
+        np.load(path_to_profiles, mmap_mode="r"),
+        dims=("id", "utc_timestamp"),
+        coords={
+            "id": pd.read_csv(path_to_unit_demand, usecols=["id"])["id"].values,
+            "utc_timestamp": pd.read_parquet(path_to_national_load).index.values
+        },
+        name="load_mw"
+    )
+
+
+def _non_industry_load_shapes(national_load, industry_load_mw, country_codes, countries):
+    """Returns the shape of national non-industrial load of each country, normed to a mean of 1.
+
+    National industrial load is the sum of industrial load of all units in the country.
+    """
+    national_industry_load_mw = pd.Series(industry_load_mw).groupby(country_codes.values).sum()
+    non_industry_load = (
+        national_load.loc[:, countries] - national_industry_load_mw.reindex(countries).values
+    ).clip(lower=0)
+    assert (non_industry_load.mean() > 0).all(), "Industrial load exceeds national load."
+    return (non_industry_load / non_industry_load.mean()).T.values
+
+
 def _determine_industry_demand(industries):
     average_load_mw = industries["average-load-mw"]
     demand_mwh = watt_to_watthours(average_load_mw, timedelta(days=365))
     return demand_mwh / 1e6
 
 
-def _determine_non_industry_demand(total_demand, local_industry_demand, units):
+def _match_national_demand(local_non_industry_demand, local_industry_demand, units, total_demand):
     if (len(units.index) == 1) and (units.iloc[0].id == "EUR"): # special case for continental level
-        return pd.Series(
-            index=units.index,
-            data=[total_demand["twh_per_year"].sum() - local_industry_demand.sum()]
-        )
+        country_codes = pd.Series(index=units.index, data="EUR")
+        national_demand = pd.Series({"EUR": total_demand["twh_per_year"].sum()})
     else:
-        national_industry_demand = local_industry_demand.groupby(units.country_code).sum()
-        national_non_industry_demand = total_demand["twh_per_year"].sub(national_industry_demand, fill_value=0.0)
-        population_share = units.groupby(
-            "country_code"
-        )["population_sum"].transform(lambda x: x / sum(x))
-        return units.country_code.map(national_non_industry_demand) * population_share
-
-
-def _allocate_industry_demand_to_units(industries, units):
-    industries_and_units = gpd.sjoin(industries, units, how="left", op='within')
-    for buffer_distance in np.linspace(start=0.01, stop=0.1, num=10):
-        mask_industries_outside_units = industries_and_units["index_right"].isnull()
-        if mask_industries_outside_units.sum() == 0:
-            break
-        print("Could not allocate all industry plants to units. Increasing the size of "
-              "industry plants with distance {}.".format(buffer_distance))
-        buffered_industry = industries.copy()
-        buffered_industry.geometry = industries.buffer(distance=buffer_distance)
-        matched = gpd.sjoin(
-            buffered_industry[mask_industries_outside_units],
-            units,
-            how="left",
-            op='intersects'
-        ) # this might lead to more than one match, hence take only the first in next line
-        industries_and_units[mask_industries_outside_units] = matched.groupby(matched.index).first()
-    return industries_and_units.groupby("index_right").demand_twh_per_year.sum().reindex(
-        units.index, fill_value=0.0
+        country_codes = units.country_code
+        national_demand = total_demand["twh_per_year"]
+    national_non_industry_demand = national_demand.sub(
+        local_industry_demand.groupby(country_codes).sum(),
+        fill_value=0.0
+    )
+    local_non_industry_demand_per_country = local_non_industry_demand.groupby(country_codes).sum()
+    national_non_industry_demand = national_non_industry_demand.reindex(local_non_industry_demand_per_country.index)
+    no_local_demand = (local_non_industry_demand_per_country == 0) & (national_non_industry_demand > 0)
+    if no_local_demand.any():
+        raise ValueError("Units in {} have no non-industrial demand to match national demand.".format(
+            ", ".join(no_local_demand.index[no_local_demand])
+        ))
+    correction = (national_non_industry_demand / local_non_industry_demand_per_country).where(
+        local_non_industry_demand_per_country > 0, 1.0
+    )
+    if ((correction - 1).abs() > 0.01).any():
+        print("Rescaling non-industrial demand by up to {:.1f}% to match national demand.".format(
+            (correction - 1).abs().max() * 100
+        ))
+    return local_non_industry_demand * country_codes.map(correction)
+
+
+def _match_industry_to_units(industries, units):
+    """Returns the position of the unit of each industry plant.
+
+    Plants within a unit are matched to that unit. All other plants are matched to their nearest
+    unit, if that is closer than MAX_DISTANCE_INDUSTRY_TO_UNIT. Both queries use the spatial index
+    of the units, which is built only once and cached on `units`.
+    """
+    industry_index, unit_index = units.sindex.query(industries.geometry, predicate="within")
+    unit_of_industry = np.full(len(industries.index), -1, dtype=np.int64)
+    order = np.lexsort((unit_index, industry_index))[::-1] # first match wins if there are many
+    unit_of_industry[industry_index[order]] = unit_index[order]
+    industries_outside_units = np.flatnonzero(unit_of_industry < 0)
+    if industries_outside_units.size > 0:
+        print("Could not allocate {} industry plants to units. Allocating them to the nearest "
+              "unit instead.".format(industries_outside_units.size))
+        nearest_industry_index, nearest_unit_index = units.sindex.nearest(
+            industries.geometry.iloc[industries_outside_units],
+            max_distance=MAX_DISTANCE_INDUSTRY_TO_UNIT,
+            return_all=False
+        )
+        unit_of_industry[industries_outside_units[nearest_industry_index]] = nearest_unit_index
+    assert (unit_of_industry >= 0).all(), "Could not allocate all industry plants."
+    return pd.Series(unit_of_industry, index=industries.index)
+
+
+def _pixels_of_industry(industries, f_units):
+    """Returns the pixel and the demand of each industry plant.
+
+    The pixel of the plant is chosen, if it lies in the unit of the plant. Otherwise, the nearest
+    pixel of the unit is chosen.
+    """
+    rows, cols = (np.asarray(indices, dtype=np.int64) for indices in rowcol(
+        f_units.transform, industries.geometry.x.values, industries.geometry.y.values
+    ))
+    labels = industries["country_label"].values
+    in_unit = np.zeros(len(industries.index), dtype=bool)
+    in_raster = (rows >= 0) & (rows < f_units.height) & (cols >= 0) & (cols < f_units.width)
+    for window in blocks(f_units):
+        in_window = np.flatnonzero(in_raster & (rows >= window.row_off) & (rows < window.row_off + window.height))
+        if in_window.size == 0:
+            continue
+        units = f_units.read(1, window=window)
+        in_unit[in_window] = units[rows[in_window] - window.row_off, cols[in_window]] == labels[in_window]
+    for i in np.flatnonzero(~in_unit): # only few plants lie outside the pixels of their unit
+        rows[i], cols[i] = _nearest_pixel_of_unit(f_units, rows[i], cols[i], labels[i],
+                                                  industries["installation"].iloc[i])
+    return pd.DataFrame({
+        "row": rows,
+        "col": cols,
+        "demand_twh_per_year": industries.demand_twh_per_year.values
+    })
+
+
+def _nearest_pixel_of_unit(f_units, row, col, label, installation):
+    search_radius = math.ceil(MAX_DISTANCE_INDUSTRY_TO_UNIT / f_units.res[0])
+    window = Window(
+        col_off=col - search_radius,
+        row_off=row - search_radius,
+        width=2 * search_radius + 1,
+        height=2 * search_radius + 1
+    )
+    units = f_units.read(1, window=window, boundless=True, fill_value=NO_UNIT)
+    rows_of_unit, cols_of_unit = np.nonzero(units == label)
+    assert rows_of_unit.size > 0, f"Unit of {installation} is not close to its pixel."
+    nearest = np.argmin((rows_of_unit - search_radius) ** 2 + (cols_of_unit - search_radius) ** 2)
+    return rows_of_unit[nearest] + window.row_off, cols_of_unit[nearest] + window.col_off
+
+
+def _population_per_country(path_to_countries_raster, path_to_population, path_to_land_cover, number_countries):
+    population = np.zeros(number_countries + NO_UNIT + 1, dtype=np.float64)
+    with rasterio.open(path_to_countries_raster, "r") as f_countries, \
+            rasterio.open(path_to_population, "r") as f_population, \
+            rasterio.open(path_to_land_cover, "r") as f_land_cover:
+        for window in blocks(f_countries):
+            population += np.bincount(
+                f_countries.read(1, window=window).ravel(),
+                weights=_population_on_land(f_population, f_land_cover, window).ravel(),
+                minlength=population.shape[0]
+            )[:population.shape[0]]
+    return population[NO_UNIT + 1:]
+
+
+def _population_on_land(f_population, f_land_cover, window):
+    population = f_population.read(1, window=window, masked=True).filled(0)
+    population[f_land_cover.read(1, window=window) == GlobCover.WATER_BODIES.value] = 0
+    return population
+
+
+def _industry_in_window(industry_pixels, window):
+    industry = np.zeros((window.height, window.width), dtype=np.float64)
+    in_window = ((industry_pixels.row >= window.row_off) &
+                 (industry_pixels.row < window.row_off + window.height))
+    np.add.at(
+        industry,
+        (industry_pixels.row[in_window].values - window.row_off,
+         industry_pixels.col[in_window].values - window.col_off),
+        industry_pixels.demand_twh_per_year[in_window].values
     )
+    return industry
 
 
 if __name__ == "__main__":
-    spatial_distribution()
+    spatial_demand()
@@ -0,0 +1,54 @@
+"""Determine geometric attributes of all units of a layer.
+
+Attributes are determined once per layer, so that consumers can read them instead of
+reprojecting the geometries of all units again.
+"""
+import click
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from src.conversion import EPSG_3035_PROJ4, transform_points
+from src.units_raster import pixels_per_unit
+
+
+@click.command()
+@click.argument("path_to_units")
+@click.argument("path_to_units_raster")
+@click.argument("path_to_output")
+def unit_attributes(path_to_units, path_to_units_raster, path_to_output):
+    """Determine area, bounds, centroid, and number of pixels of each unit.
+
+    Area [km2] and centroid are determined in an equal-area projection. Bounds and centroid are
+    given in the coordinate reference system of the units. The number of pixels is the number
+    of pixels of the unit on the study grid.
+    """
+    units = gpd.read_parquet(path_to_units, columns=["id", "country_code", "geometry"])
+    equal_area_geometries = units.geometry.to_crs(EPSG_3035_PROJ4).values
+    bounds = shapely.bounds(units.geometry.values)
+    centroids = shapely.centroid(equal_area_geometries)
+    centroid_x, centroid_y = transform_points(
+        shapely.get_x(centroids),
+        shapely.get_y(centroids),
+        from_epsg=EPSG_3035_PROJ4,
+        to_epsg=units.crs
+    )
+    pd.DataFrame(
+        index=pd.Index(units["id"].values, name="id"),
+        data={
+            "country_code": units["country_code"].values,
+            "area_km2": shapely.area(equal_area_geometries) / 1e6,
+            "x_min": bounds[:, 0],
+            "y_min": bounds[:, 1],
+            "x_max": bounds[:, 2],
+            "y_max": bounds[:, 3],
+            "centroid_x": centroid_x,
+            "centroid_y": centroid_y,
+            "pixels": pixels_per_unit(path_to_units_raster, len(units.index)).astype(np.int64)
+        }
+    ).to_csv(path_to_output, header=True, index=True)
+
+
+if __name__ == "__main__":
+    unit_attributes()
@@ -1,11 +1,15 @@
 """Remixes NUTS, LAU, and GADM data to form the units of the analysis."""
+from collections import defaultdict
+from multiprocessing import Pool
+
 import click
 import pandas as pd
 import geopandas as gpd
-import fiona
-import pycountry
+import shapely
 
 from utils import Config
+from conversion import to_iso3
+from geoparquet import LAYER_COLUMN
 
 DRIVER = "GeoJSON"
 
@@ -15,30 +19,54 @@ DRIVER = "GeoJSON"
 @click.argument("path_to_lau2")
 @click.argument("path_to_gadm")
 @click.argument("path_to_output")
+@click.argument("path_to_output_parquet")
 @click.argument("layer_name")
 @click.argument("config", type=Config())
-def remix_units(path_to_nuts, path_to_lau2, path_to_gadm, path_to_output, layer_name, config):
-    """Remixes NUTS, LAU, and GADM data to form the units of the analysis."""
-    source_layers = _read_source_layers(path_to_nuts, path_to_lau2, path_to_gadm)
-    _validate_source_layers(source_layers)
+@click.option("--threads", default=1, type=click.INT,
+              help="Number of processes used to unite the units of the continental layer.")
+@click.option("--grid-size", default=None, type=click.FLOAT,
+              help="Snap the continental layer to a grid of this size [degrees].")
+def remix_units(path_to_nuts, path_to_lau2, path_to_gadm, path_to_output, path_to_output_parquet,
+                layer_name, config, threads, grid_size):
+    """Remixes NUTS, LAU, and GADM data to form the units of the analysis.
+
+    Source data is read from GeoParquet, and only for those countries and source layers that
+    are used in the layer. Units are written both as GeoJSON and as GeoParquet.
+    """
     _validate_layer_config(config, layer_name)
+    source_layers = _read_source_layers(
+        path_to_nuts, path_to_lau2, path_to_gadm,
+        country_to_source_map=config["layers"][layer_name]
+    )
+    _validate_source_layers(source_layers)
     layer = _build_layer(config["layers"][layer_name], source_layers)
     _validate_layer(layer, layer_name, config["scope"]["countries"])
     if layer_name == "continental": # treat special case
-        layer = _continental_layer(layer)
-    _write_layer(layer, path_to_output)
-
-
-def _read_source_layers(path_to_nuts, path_to_lau2, path_to_gadm):
-    source_layers = {
-        layer_name: gpd.read_file(path_to_nuts, layer=layer_name)
-        for layer_name in fiona.listlayers(path_to_nuts)
-    }
-    source_layers["lau2"] = gpd.read_file(path_to_lau2)
-    source_layers.update({
-        layer_name: gpd.read_file(path_to_gadm, layer=layer_name)
-        for layer_name in fiona.listlayers(path_to_gadm)
-    })
+        layer = _continental_layer(layer, threads, grid_size)
+    _write_layer(layer, path_to_output, path_to_output_parquet)
+
+
+def _read_source_layers(path_to_nuts, path_to_lau2, path_to_gadm, country_to_source_map):
+    # reads only the units of those countries that are taken from each source layer
+    country_codes = defaultdict(list)
+    for country_code, source_layer in zip(to_iso3(list(country_to_source_map.keys())),
+                                          country_to_source_map.values()):
+        country_codes[source_layer].append(country_code)
+    source_layers = {}
+    for source_layer, country_codes_of_layer in country_codes.items():
+        filters = [("country_code", "in", country_codes_of_layer)]
+        if source_layer == "lau2":
+            path_to_source = path_to_lau2
+        elif source_layer.startswith("nuts"):
+            path_to_source = path_to_nuts
+            filters.append((LAYER_COLUMN, "==", source_layer))
+        elif source_layer.startswith("gadm"):
+            path_to_source = path_to_gadm
+            filters.append((LAYER_COLUMN, "==", source_layer))
+        else:
+            raise ValueError("Unknown source layer {}.".format(source_layer))
+        source_layer_data = gpd.read_parquet(path_to_source, filters=filters)
+        source_layers[source_layer] = source_layer_data.drop(columns=LAYER_COLUMN)
     return source_layers
 
 
@@ -57,25 +85,24 @@ def _validate_layer_config(config, layer_name):
 def _build_layer(country_to_source_map, source_layers):
     crs = [layer.crs for layer in source_layers.values()][0]
     layer = pd.concat([
-        source_layers[source_layer][source_layers[source_layer].country_code == _iso3(country)]
-        for country, source_layer in country_to_source_map.items()
+        source_layers[source_layer][source_layers[source_layer].country_code == country_code]
+        for country_code, source_layer in zip(to_iso3(list(country_to_source_map.keys())),
+                                              country_to_source_map.values())
     ])
     assert isinstance(layer, pd.DataFrame)
     return gpd.GeoDataFrame(layer, crs=crs)
 
 
 def _validate_layer(layer, layer_name, countries):
-    assert all(_iso3(country) in layer.country_code.unique()
-               for country in countries), (f"Countries are missing in layer {layer_name}.")
-
+    country_codes = layer.country_code.unique()
+    assert all(to_iso3(countries).isin(country_codes)), f"Countries are missing in layer {layer_name}."
 
-def _iso3(country_name):
-    return pycountry.countries.lookup(country_name).alpha_3
 
-
-def _continental_layer(layer):
+def _continental_layer(layer, threads, grid_size):
     # special case all Europe
-    layer = layer.dissolve(by=[1 for idx in layer.index])
+    geometry = _parallel_union(layer, threads, grid_size)
+    layer = layer.iloc[[0]].reset_index(drop=True)
+    layer.geometry = [geometry]
     index = layer.index[0]
     layer.loc[index, "id"] = "EUR"
     layer.loc[index, "country_code"] = "EUR"
@@ -85,11 +112,29 @@ def _continental_layer(layer):
     return layer
 
 
-def _write_layer(gdf, path_to_file):
+def _parallel_union(layer, threads, grid_size):
+    # Unites the units of each country in parallel, then merges countries pairwise in parallel
+    # until only one geometry is left. With a grid size, all vertices are snapped to a grid of
+    # that size, which avoids slivers between neighbouring units.
+    countries = [country.values for _, country in layer.geometry.groupby(layer["country_code"])]
+    with Pool(threads) as pool:
+        unions = pool.starmap(_union, [(country, grid_size) for country in countries])
+        while len(unions) > 1:
+            pairs = [unions[i:i + 2] for i in range(0, len(unions), 2)]
+            unions = pool.starmap(_union, [(pair, grid_size) for pair in pairs])
+    return unions[0]
+
+
+def _union(geometries, grid_size):
+    return shapely.union_all(geometries, grid_size=grid_size)
+
+
+def _write_layer(gdf, path_to_file, path_to_parquet):
     gdf.to_file(
         path_to_file,
         driver=DRIVER
     )
+    gdf.to_parquet(path_to_parquet, index=False)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+"""Rasterise units onto the study grid and aggregate raster data per unit.
+
+Each pixel of the unit raster holds the label of the unit it belongs to. Labels are the
+position of the unit in the units file plus one, and 0 marks pixels outside of all units.
+Aggregating any raster on the study grid per unit then reduces to a bincount over the labels,
+which is much faster than computing zonal statistics for each unit separately.
+"""
+import click
+import numpy as np
+import geopandas as gpd
+import rasterio
+from rasterio.features import rasterize
+
+from src.utils import determine_pixel_areas_per_row, blocks
+
+DTYPE = np.uint32
+NO_UNIT = 0
+
+
+@click.command()
+@click.argument("path_to_units")
+@click.argument("path_to_reference")
+@click.argument("path_to_output")
+def rasterise_units(path_to_units, path_to_reference, path_to_output):
+    """Rasterise units onto the grid of the reference raster.
+
+    A pixel belongs to a unit when its centre lies within the unit, in analogy to the
+    default behaviour of zonal statistics.
+    """
+    with rasterio.open(path_to_reference, "r") as src:
+        meta = src.meta
+    units = gpd.read_parquet(path_to_units, columns=["geometry"])
+    labels = rasterize(
+        ((geometry, label) for label, geometry in enumerate(units.geometry, start=NO_UNIT + 1)),
+        out_shape=(meta["height"], meta["width"]),
+        transform=meta["transform"],
+        fill=NO_UNIT,
+        dtype=DTYPE
+    )
+    meta.update(dtype=DTYPE, nodata=NO_UNIT, count=1, compress="lzw")
+    with rasterio.open(path_to_output, "w", **meta) as dst:
+        dst.write(labels, 1)
+
+
+def sum_per_unit(path_to_units_raster, path_to_raster, number_units, band=1):
+    """Sums the values of a raster on the study grid per unit.
+
+    Returns a numpy array with one value per unit, in the order of the units file.
+    """
+    sums = np.zeros(number_units + 1, dtype=np.float64)
+    with rasterio.open(path_to_units_raster, "r") as f_labels, rasterio.open(path_to_raster, "r") as f_values:
+        _assert_same_grid(f_labels, f_values)
+        for window in blocks(f_labels):
+            labels = f_labels.read(1, window=window).ravel()
+            values = f_values.read(band, window=window, masked=True).filled(0).ravel()
+            sums += _bincount(labels, values, number_units + 1)
+    return sums[NO_UNIT + 1:]
+
+
+def pixels_per_unit(path_to_units_raster, number_units):
+    """Counts the pixels of each unit.
+
+    Returns a numpy array with one value per unit, in the order of the units file.
+    """
+    counts = np.zeros(number_units + 1, dtype=np.float64)
+    with rasterio.open(path_to_units_raster, "r") as f_labels:
+        for window in blocks(f_labels):
+            counts += _bincount(f_labels.read(1, window=window).ravel(), None, number_units + 1)
+    return counts[NO_UNIT + 1:]
+
+
+def categories_per_unit(path_to_units_raster, path_to_categories, categories, number_units,
+                        area_weighted=False):
+    """Counts the pixels of each category per unit.
+
+    If `area_weighted`, the pixels are weighted by their size, resulting in areas [km2]
+    rather than pixel counts.
+
+    Returns a numpy array of shape (units, categories) in the order of the units file and
+    the given categories. Pixels of any other category are ignored.
+    """
+    categories = np.asarray(categories, dtype=np.int64)
+    category_index = np.full(categories.max() + 1, -1, dtype=np.int64)
+    category_index[categories] = np.arange(len(categories))
+    counts = np.zeros((number_units + 1) * len(categories), dtype=np.float64)
+    with rasterio.open(path_to_units_raster, "r") as f_labels, \
+            rasterio.open(path_to_categories, "r") as f_categories:
+        _assert_same_grid(f_labels, f_categories)
+        if area_weighted:
+            pixel_area = determine_pixel_areas_per_row(f_categories.crs, f_categories.bounds,
+                                                       f_categories.res[0])
+            assert pixel_area.shape[0] == f_categories.height
+        for window in blocks(f_labels):
+            labels = f_labels.read(1, window=window).ravel().astype(np.int64)
+            pixel_categories = f_categories.read(1, window=window).ravel().astype(np.int64)
+            known = (pixel_categories >= 0) & (pixel_categories < category_index.shape[0])
+            known[known] = category_index[pixel_categories[known]] >= 0
+            index = labels[known] * len(categories) + category_index[pixel_categories[known]]
+            if area_weighted:
+                weights = pixel_area[window.row_off:window.row_off + window.height].repeat(window.width)[known]
+            else:
+                weights = None
+            counts += _bincount(index, weights, counts.shape[0])
+    return counts.reshape(number_units + 1, len(categories))[NO_UNIT + 1:]
+
+
+def _bincount(index, weights, minlength):
+    counts = np.bincount(index, weights=weights, minlength=minlength)
+    assert counts.shape[0] == minlength, "Raster contains more units than expected."
+    return counts
+
+
+def _assert_same_grid(src1, src2):
+    assert src1.shape == src2.shape, "Rasters must be on the same grid."
+    assert src1.transform.almost_equals(src2.transform), "Rasters must be on the same grid."
+
+
+if __name__ == "__main__":
+    rasterise_units()
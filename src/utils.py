@@ -1,13 +1,17 @@
 """Module containing utilities."""
+import copy
 import math
 from pathlib import Path
 
 import click
 import numpy as np
+import pandas as pd
 import rasterio
+from rasterio.windows import Window, from_bounds
 import yaml
 
 PATH_TO_CONFIGS = Path(__file__).parent / '..' / 'config'
+ROWS_PER_BLOCK = 1024
 
 
 class Config(click.ParamType):
@@ -30,9 +34,90 @@ def read_config(path_to_file):
         raise ValueError("Config {} does not exist.".format(path_to_file))
     with path_to_file.open('r') as stream:
         try:
-            return yaml.safe_load(stream)
+            config = yaml.safe_load(stream)
         except yaml.YAMLError as exc:
             raise IOError(exc)
+    return apply_sub_scope(config)
+
+
+def apply_sub_scope(config):
+    """Restricts the scope of a configuration to its sub-scope, if there is one.
+
+    The countries and bounds of the sub-scope replace those of the scope, and all other countries
+    are removed from all layers. Raster data is clipped to the bounds of the scope, hence the
+    study grid of a sub-scope is a window of the study grid of the entire scope.
+
+    Applying the sub-scope more than once has no further effect.
+    """
+    sub_scope = config.get("sub-scope")
+    if not sub_scope:
+        return config
+    countries = sub_scope["countries"]
+    bounds = sub_scope["bounds"]
+    scope_bounds = config["scope"]["bounds"]
+    assert scope_bounds["x_min"] <= bounds["x_min"] < bounds["x_max"] <= scope_bounds["x_max"] and \
+        scope_bounds["y_min"] <= bounds["y_min"] < bounds["y_max"] <= scope_bounds["y_max"], \
+        "Bounds of the sub-scope must lie within the bounds of the scope."
+    assert all(
+        country in layer.keys() for layer in config["layers"].values() for country in countries
+    ), "All countries of the sub-scope must be part of all layers."
+    config = copy.deepcopy(config)
+    config["scope"]["countries"] = list(countries)
+    config["scope"]["bounds"] = dict(bounds)
+    config["layers"] = {
+        layer_name: {country: source for country, source in layer.items() if country in countries}
+        for layer_name, layer in config["layers"].items()
+    }
+    return config
+
+
+def read_window_of_geometry(path_to_raster, geometry, band=1, masked=False):
+    """Reads only the window of a raster that covers a geometry.
+
+    The geometry must be given in the coordinate reference system of the raster.
+
+    Returns the data of the window and the transform of the window: (data, transform).
+    """
+    return read_window_of_bounds(path_to_raster, geometry.bounds, band=band, masked=masked)
+
+
+def read_window_of_unit(path_to_raster, path_to_unit_attributes, unit_id, band=1, masked=False):
+    """Reads only the window of a raster that covers a unit.
+
+    The bounds of the unit are taken from the unit attributes of its layer, hence the geometries
+    of units are not read at all.
+
+    Returns the data of the window and the transform of the window: (data, transform).
+    """
+    attributes = pd.read_csv(path_to_unit_attributes, index_col="id").loc[unit_id]
+    bounds = attributes[["x_min", "y_min", "x_max", "y_max"]].astype(np.float64).values
+    return read_window_of_bounds(path_to_raster, bounds, band=band, masked=masked)
+
+
+def read_window_of_bounds(path_to_raster, bounds, band=1, masked=False):
+    """Reads only the window of a raster that covers bounds (x_min, y_min, x_max, y_max).
+
+    The window contains all pixels that intersect the bounds, clipped to the extent of the raster.
+
+    Returns the data of the window and the transform of the window: (data, transform).
+    """
+    with rasterio.open(path_to_raster, "r") as src:
+        window = from_bounds(*bounds, transform=src.transform)
+        col_off, row_off = math.floor(window.col_off), math.floor(window.row_off)
+        window = Window(
+            col_off=col_off,
+            row_off=row_off,
+            width=math.ceil(window.col_off + window.width) - col_off,
+            height=math.ceil(window.row_off + window.height) - row_off
+        ).intersection(Window(0, 0, src.width, src.height))
+        return src.read(band, window=window, masked=masked), src.window_transform(window)
+
+
+def blocks(src, rows_per_block=ROWS_PER_BLOCK):
+    """Yields windows of full rows of a raster, covering the raster from top to bottom."""
+    for row_off in range(0, src.height, rows_per_block):
+        yield Window(col_off=0, row_off=row_off, width=src.width,
+                     height=min(rows_per_block, src.height - row_off))
 
 
 def determine_pixel_areas(crs, bounds, resolution):
@@ -50,6 +135,29 @@ def determine_pixel_areas(crs, bounds, resolution):
     assert crs == rasterio.crs.CRS.from_epsg("4326") # WGS84
     width = int((bounds.right - bounds.left) / resolution)
     height = int((bounds.top - bounds.bottom) / resolution)
+    pixel_area = _pixel_areas_of_rows(bounds, resolution, height) # vector
+    return pixel_area.repeat(width).reshape(height, width).astype(np.float64)
+
+
+def determine_pixel_areas_per_row(crs, bounds, resolution):
+    """Returns a vector in which the value corresponds to the area [km2] of the pixels in each row.
+
+    All pixels in one row of a WGS84 raster have the same size. Use this instead of
+    `determine_pixel_areas` whenever the full raster of pixel areas is not needed. The number of
+    rows is rounded, as floating point errors in the bounds can make it slightly smaller than
+    the height of the raster.
+
+    Parameters:
+        crs: the coordinate reference system of the data (must be WGS84)
+        bounds: an object with attributes left/right/top/bottom given in degrees
+        resolution: the scalar resolution (remember: square pixels) given in degrees
+    """
+    assert crs == rasterio.crs.CRS.from_epsg("4326") # WGS84
+    height = round((bounds.top - bounds.bottom) / resolution)
+    return _pixel_areas_of_rows(bounds, resolution, height)
+
+
+def _pixel_areas_of_rows(bounds, resolution, height):
     latitudes = np.linspace(
         start=bounds.top,
         stop=bounds.bottom,
@@ -58,8 +166,7 @@ def determine_pixel_areas(crs, bounds, resolution):
         dtype=np.float64
     )
     varea_of_pixel = np.vectorize(lambda lat: _area_of_pixel(resolution, lat))
-    pixel_area = varea_of_pixel(latitudes) # vector
-    return pixel_area.repeat(width).reshape(height, width).astype(np.float64)
+    return varea_of_pixel(latitudes).astype(np.float64)
 
 
 def _area_of_pixel(pixel_size, center_lat):
@@ -1,12 +1,9 @@
 """Visualise patterns in load."""
-from datetime import datetime
-
 import click
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-from src.process_load import read_load_profiles
 from src.capacity_factors import capacity_factor, average_capacity_factor
 
 
@@ -15,11 +12,7 @@ from src.capacity_factors import capacity_factor, average_capacity_factor
 @click.argument("path_to_plot")
 def visualise_capacity_factors(path_to_load, path_to_plot):
     sns.set_context('paper')
-    national = read_load_profiles(
-        path_to_load,
-        start=datetime(2016, 1, 1),
-        end=datetime(2017, 1, 1)
-    )
+    national = pd.read_parquet(path_to_load)
     cap_factors = national.apply(capacity_factor, axis="index")
     cap_factors["EU"] = capacity_factor(national.sum(axis="columns"))
     fig = plt.figure(figsize=(8, 4))
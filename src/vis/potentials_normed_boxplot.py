@@ -7,10 +7,9 @@ import geopandas as gpd
 import matplotlib
 import matplotlib.pyplot as plt
 import seaborn as sns
-import pycountry
-
 
 from src.vis import RED, GREEN, BLUE
+from src.conversion import to_country_name
 
 SORT_QUANTILE = 0.5
 
@@ -23,7 +22,7 @@ def visualise_normed_potentials(path_to_results, path_to_plot):
     sns.set_context('paper')
     units = pd.DataFrame(gpd.read_file(path_to_results))
     units = units[["country_code", "population_sum", "normed_potential"]]
-    units["country"] = units["country_code"].map(lambda country_code: pycountry.countries.lookup(country_code).name)
+    units["country"] = to_country_name(units["country_code"]).values
     units["country"].replace("Macedonia, Republic of", value="Macedonia", inplace=True) # too long
     units["country"].replace("Bosnia and Herzegovina", value="Bosnia", inplace=True) # too long
     people = pd.DataFrame(
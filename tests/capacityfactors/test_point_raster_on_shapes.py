@@ -0,0 +1,26 @@
+from itertools import product
+
+import numpy as np
+import geopandas as gpd
+import shapely.geometry
+
+from src.capacityfactors import point_raster_on_shapes, EPSG_3035, WGS84
+from src.conversion import transform_coordinates
+
+BOUNDS = {"x_min": -10, "y_min": 30, "x_max": 30, "y_max": 70}
+RESOLUTION_KM2 = 50
+
+
+def test_points_originate_in_corners_of_bounds():
+    shapes = gpd.GeoDataFrame(geometry=[shapely.geometry.box(0, 45, 20, 60)], crs=WGS84)
+    points = point_raster_on_shapes(BOUNDS, RESOLUTION_KM2, shapes)
+    corners = [transform_coordinates(x, y, WGS84, EPSG_3035)
+               for x, y in product([BOUNDS["x_min"], BOUNDS["x_max"]], [BOUNDS["y_min"], BOUNDS["y_max"]])]
+    x_min, y_min = min(x for x, _ in corners), min(y for _, y in corners)
+
+    points_3035 = points.to_crs(EPSG_3035)
+    steps_x = (points_3035.x - x_min) / (RESOLUTION_KM2 * 1000)
+    steps_y = (points_3035.y - y_min) / (RESOLUTION_KM2 * 1000)
+    assert len(points) > 0
+    assert np.allclose(steps_x, steps_x.round(), atol=1e-6)
+    assert np.allclose(steps_y, steps_y.round(), atol=1e-6)
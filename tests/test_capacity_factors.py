@@ -1,8 +1,12 @@
 import math
 
+import numpy as np
 import pandas as pd
+import pytest
 
-from src.capacity_factors_demand import average_capacity_factor
+import src.capacity_factors_demand
+from src.capacity_factors_demand import average_capacity_factor, _local_capacity_factors
+from src.spatial_demand import read_profiles
 
 
 def test_average_capacity_factor():
@@ -10,3 +14,22 @@ def test_average_capacity_factor():
     demands = pd.Series([2 / 3, 1 / 3])
     expected_average = 2 / 3
     assert math.isclose(average_capacity_factor(cap_factors, demands), expected_average)
+
+
+def test_local_capacity_factors(tmpdir, monkeypatch):
+    monkeypatch.setattr(src.capacity_factors_demand, "UNITS_PER_CHUNK", 2)
+    path_to_national_load = str(tmpdir.join("national-load.parquet"))
+    path_to_profiles = str(tmpdir.join("profiles.npy"))
+    path_to_demand = str(tmpdir.join("demand.csv"))
+    pd.DataFrame(
+        {"DEU": [1.0, 2.0, 3.0, 2.0]},
+        index=pd.date_range("2017-01-01", periods=4, freq="h", name="utc_timestamp")
+    ).to_parquet(path_to_national_load)
+    np.save(path_to_profiles, np.array([[2, 2, 2, 2], [0, 1, 2, 1], [1, 1, 1, 5]], dtype=np.float32))
+    pd.DataFrame({"id": ["A", "B", "C"]}).to_csv(path_to_demand, index=False)
+
+    cap_factors, demands = _local_capacity_factors(
+        read_profiles(path_to_profiles, path_to_demand, path_to_national_load)
+    )
+    assert cap_factors.to_dict() == pytest.approx({"A": 1.0, "B": 0.5, "C": 0.4})
+    assert demands.to_dict() == pytest.approx({"A": 8.0, "B": 4.0, "C": 8.0})
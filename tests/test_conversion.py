@@ -1,10 +1,11 @@
 from datetime import timedelta
 import math
 
+import pandas as pd
 import pytest
 
 from src.conversion import watt_to_watthours, eu_country_code_to_iso3, coordinate_string_to_decimal,\
-    transform_coordinates
+    coordinates_to_decimal, transform_coordinates, transform_points, transform_bounds, to_iso3
 
 
 @pytest.mark.parametrize("watt,duration,expected_watthour", [
@@ -26,6 +27,19 @@ def test_eu_country_code(eu_country_code, iso3):
     assert eu_country_code_to_iso3(eu_country_code) == iso3
 
 
+def test_series_to_iso3():
+    countries = pd.Series(["Germany", "EL", "DEU", "gb", "Germany"], index=[5, 4, 3, 2, 1])
+    iso3 = to_iso3(countries)
+    assert iso3.tolist() == ["DEU", "GRC", "DEU", "GBR", "DEU"]
+    assert iso3.index.tolist() == [5, 4, 3, 2, 1]
+
+
+def test_series_to_iso3_keeps_missing_values():
+    iso3 = to_iso3(pd.Series(["Germany", None, float("nan"), "EL"]))
+    assert iso3.tolist()[0] == "DEU"
+    assert iso3.isnull().tolist() == [False, True, True, False]
+
+
 @pytest.mark.parametrize(
     "arcminutes,expected_easting,expected_northing",
     [("""48°18'N 14°17'E""", 14.283333, 48.300000),
@@ -44,7 +58,9 @@ def test_coordinates_to_decimal(arcminutes, expected_easting, expected_northing)
      ("""48°18'N, 14°17' O""", 14.283333, 48.300000),
      ("""48.300000 N, 14.283333O""", 14.283333, 48.300000),
      ("""48°18′N 14°17′E""", 14.283333, 48.300000),
-     ("""48°18′0.0″N 14°17′0.0″E""", 14.283333, 48.300000)]
+     ("""48°18′0.0″N 14°17′0.0″E""", 14.283333, 48.300000),
+     ("""54°35′20″N 1°11′15″W""", -1.187500, 54.588889),
+     ("""42.553405N -6.769661E""", -6.769661, 42.553405)]
 )
 def test_coordinates_to_decimal_edgecases(arcminutes, expected_easting, expected_northing):
     easting, northing = coordinate_string_to_decimal(arcminutes)
@@ -52,6 +68,17 @@ def test_coordinates_to_decimal_edgecases(arcminutes, expected_easting, expected
     assert math.isclose(northing, expected_northing, abs_tol=0.00001)
 
 
+def test_series_of_coordinates_to_decimal():
+    eastings, northings = coordinates_to_decimal(pd.Series(["48°18'N 14°17'E", "48.3N 14.283333E"], index=[3, 1]))
+    assert eastings == pytest.approx([14.283333, 14.283333], abs=0.00001)
+    assert northings == pytest.approx([48.3, 48.3], abs=0.00001)
+
+
+def test_invalid_coordinates():
+    with pytest.raises(AssertionError):
+        coordinates_to_decimal(pd.Series(["48°18'N 14°17'E", "not a coordinate"]))
+
+
 @pytest.mark.parametrize(
     "from_epsg,from_x,from_y,to_x,to_y",
     [("EPSG:4326", 8.55, 47.36, 4211389.55, 2695117.37), # values from epsg.io
@@ -99,3 +126,18 @@ def test_transform_coordinates_to_epsg4326(from_epsg, to_x, to_y, from_x, from_y
     )
     assert math.isclose(x, to_x, abs_tol=0.01)
     assert math.isclose(y, to_y, abs_tol=0.01)
+
+
+def test_transform_points_to_epsg3035():
+    xs, ys = transform_points([8.55, 33.87], [47.36, 89.44], from_epsg="EPSG:4326", to_epsg="EPSG:3035")
+    assert xs == pytest.approx([4211389.55, 4347749.36], abs=0.1) # values from epsg.io
+    assert ys == pytest.approx([2695117.37, 7315609.95], abs=0.1)
+
+
+def test_transform_bounds_contains_curved_edges():
+    # in EPSG:3035, the southern edge of these bounds bends southwards between the corners
+    x_min, y_min, x_max, y_max = transform_bounds(-10, 30, 30, 70, from_epsg="EPSG:4326", to_epsg="EPSG:3035")
+    _, y_centre = transform_coordinates(10, 30, from_epsg="EPSG:4326", to_epsg="EPSG:3035")
+    _, y_corner = transform_coordinates(-10, 30, from_epsg="EPSG:4326", to_epsg="EPSG:3035")
+    assert y_centre < y_corner
+    assert y_min <= y_centre
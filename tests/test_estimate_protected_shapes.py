@@ -0,0 +1,29 @@
+import geopandas as gpd
+import pytest
+import shapely.geometry
+
+from src.estimate_protected_shapes import estimate_circles
+
+REPORTED_AREAS = [0.01, 1.0, 25.0, 1200.0] # km2
+
+
+@pytest.fixture
+def points():
+    return gpd.GeoDataFrame(
+        {"REP_AREA": REPORTED_AREAS},
+        geometry=[shapely.geometry.Point(x, y) for x, y in [(8.5, 47.4), (-3.7, 40.4), (24.9, 60.2), (12.5, 41.9)]],
+        crs="EPSG:4326"
+    )
+
+
+@pytest.mark.parametrize("quad_segments", [8, 16, 64])
+def test_areas_of_circles_match_reported_areas(points, quad_segments):
+    circles = estimate_circles(points, quad_segments)
+    assert (circles.area / 1e6).tolist() == pytest.approx(REPORTED_AREAS, rel=0.01)
+
+
+def test_circles_are_centred_on_points(points):
+    circles = estimate_circles(points, quad_segments=16)
+    centres = points.to_crs(circles.crs).geometry
+    assert circles.centroid.x.tolist() == pytest.approx(centres.x.tolist(), abs=1e-3)
+    assert circles.centroid.y.tolist() == pytest.approx(centres.y.tolist(), abs=1e-3)
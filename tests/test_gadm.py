@@ -0,0 +1,26 @@
+import fiona
+import geopandas as gpd
+import shapely
+
+from src.gadm import _write_layers
+
+
+def _layer(ids):
+    return gpd.GeoDataFrame(
+        {"country_code": "ABC", "id": ids, "name": ids, "type": "country", "proper": 1},
+        geometry=[shapely.MultiPolygon([shapely.box(i, 0, i + 1, 1)]) for i in range(len(ids))],
+        crs="EPSG:4326"
+    )
+
+
+def test_layers_start_with_first_country_with_units(tmpdir):
+    path_to_output = str(tmpdir.join("units.gpkg"))
+    country_layers = [
+        [_layer(["A"]), _layer([])],
+        [_layer(["B"]), _layer(["B.1", "B.2"])],
+        [_layer(["C"]), _layer(["C.1"])]
+    ]
+    _write_layers(iter(country_layers), range(2), path_to_output)
+    assert sorted(fiona.listlayers(path_to_output)) == ["gadm0", "gadm1"]
+    assert gpd.read_file(path_to_output, layer="gadm0").id.tolist() == ["A", "B", "C"]
+    assert gpd.read_file(path_to_output, layer="gadm1").id.tolist() == ["B.1", "B.2", "C.1"]
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from click.testing import CliRunner
+
+import src.population
+from src.population import population, WATER, NOT_WATER
+from src.conversion import transform_points
+
+REFERENCE_TRANSFORM = from_origin(7.6, 48.0, 0.01, 0.01)
+REFERENCE_SHAPE = (100, 150)
+
+
+@pytest.fixture
+def population_data():
+    data = np.zeros((60, 60), dtype=np.float32)
+    data[10:50, 10:50] = np.random.default_rng(seed=42).uniform(0, 100, size=(40, 40))
+    return data
+
+
+@pytest.fixture
+def path_to_population(tmpdir, population_data):
+    path = str(tmpdir.join("population.tif"))
+    (x,), (y,) = transform_points([8.0], [47.7], "EPSG:4326", "ESRI:54009")
+    with rasterio.open(path, "w", driver="GTiff", height=60, width=60, count=1, dtype=np.float32,
+                       crs="ESRI:54009", transform=from_origin(x, y, 1000, 1000), nodata=-200) as dst:
+        dst.write(population_data, 1)
+    return path
+
+
+@pytest.fixture
+def path_to_reference(tmpdir):
+    path = str(tmpdir.join("reference.tif"))
+    with rasterio.open(path, "w", driver="GTiff", height=REFERENCE_SHAPE[0], width=REFERENCE_SHAPE[1],
+                       count=1, dtype=np.uint8, crs="EPSG:4326", transform=REFERENCE_TRANSFORM) as dst:
+        dst.write(np.zeros(REFERENCE_SHAPE, dtype=np.uint8), 1)
+    return path
+
+
+@pytest.fixture
+def path_to_regridded(tmpdir, path_to_population, path_to_reference, monkeypatch):
+    monkeypatch.setattr(src.population, "ROWS_PER_BLOCK", 16)
+    path = str(tmpdir.join("regridded.tif"))
+    result = CliRunner().invoke(population, ["regrid", path_to_population, path_to_reference, path])
+    assert result.exit_code == 0, result.output
+    return path
+
+
+def test_regridding_conserves_population(path_to_regridded, population_data):
+    with rasterio.open(path_to_regridded, "r") as src:
+        regridded = src.read(1)
+    # equal up to the precision of float32
+    assert regridded.sum(dtype=np.float64) == pytest.approx(population_data.sum(dtype=np.float64), rel=1e-6)
+
+
+def test_regridding_conserves_population_in_grid(tmpdir, path_to_population, population_data):
+    # the grid covers only the north west of the population data
+    path_to_reference = str(tmpdir.join("small-reference.tif"))
+    transform = from_origin(7.6, 48.0, 0.01, 0.01)
+    with rasterio.open(path_to_reference, "w", driver="GTiff", height=60, width=90, count=1, dtype=np.uint8,
+                       crs="EPSG:4326", transform=transform) as dst:
+        dst.write(np.zeros((60, 90), dtype=np.uint8), 1)
+    path_to_output = str(tmpdir.join("small-regridded.tif"))
+    result = CliRunner().invoke(population, ["regrid", path_to_population, path_to_reference, path_to_output])
+    assert result.exit_code == 0, result.output
+    with rasterio.open(path_to_population, "r") as src:
+        rows, cols = np.indices(population_data.shape)
+        xs, ys = src.transform * (cols.ravel() + 0.5, rows.ravel() + 0.5)
+        lons, lats = transform_points(xs, ys, "ESRI:54009", "EPSG:4326")
+    in_grid = (lons >= 7.6) & (lons < 8.5) & (lats > 47.4) & (lats <= 48.0)
+    expected = population_data.ravel()[in_grid].sum(dtype=np.float64)
+    with rasterio.open(path_to_output, "r") as src:
+        regridded = src.read(1)
+    assert 0 < expected < population_data.sum(dtype=np.float64)
+    assert regridded.sum(dtype=np.float64) == pytest.approx(expected, rel=1e-6)
+
+
+def test_regridding_is_local(path_to_regridded):
+    with rasterio.open(path_to_regridded, "r") as src:
+        regridded = src.read(1)
+    assert (regridded[:, :5] == 0).all() # far west of the population data
+    assert (regridded > 0).mean() < 0.5
+
+
+def test_allocation_conserves_population(tmpdir, path_to_regridded, population_data):
+    labels = np.ones(REFERENCE_SHAPE, dtype=np.uint32)
+    labels[:, REFERENCE_SHAPE[1] // 2:] = 2
+    path_to_units_raster = str(tmpdir.join("units.tif"))
+    with rasterio.open(path_to_units_raster, "w", driver="GTiff", height=REFERENCE_SHAPE[0],
+                       width=REFERENCE_SHAPE[1], count=1, dtype=np.uint32, crs="EPSG:4326",
+                       transform=REFERENCE_TRANSFORM) as dst:
+        dst.write(labels, 1)
+    path_to_units = str(tmpdir.join("units.parquet"))
+    pd.DataFrame({"id": ["west", "east"], "proper": [True, True]}).to_parquet(path_to_units)
+    path_to_attributes = str(tmpdir.join("attributes.csv"))
+    pd.DataFrame({"id": ["west", "east"], "area_km2": [1000.0, 2000.0]}).to_csv(path_to_attributes, index=False)
+    path_to_land_cover = str(tmpdir.join("land-cover.csv"))
+    land_cover = pd.DataFrame({"id": ["west", "east"], WATER: [0.0, 0.0]})
+    for column in NOT_WATER:
+        land_cover[column] = 1.0
+    land_cover.to_csv(path_to_land_cover, index=False)
+    path_to_output = str(tmpdir.join("population.csv"))
+
+    result = CliRunner().invoke(population, [
+        "allocate", path_to_units, path_to_attributes, path_to_units_raster, path_to_regridded,
+        path_to_land_cover, path_to_output
+    ])
+    assert result.exit_code == 0, result.output
+    allocated = pd.read_csv(path_to_output, index_col="id")
+    with rasterio.open(path_to_regridded, "r") as src:
+        regridded = src.read(1)
+    assert allocated["population_sum"].sum() == pytest.approx(regridded.sum(dtype=np.float64), rel=1e-6)
+    assert allocated["population_sum"].sum() == pytest.approx(population_data.sum(dtype=np.float64), rel=1e-6)
+    assert allocated["density_p_per_km2"].tolist() == pytest.approx(
+        (allocated["population_sum"] / pd.Series({"west": 1000.0, "east": 2000.0})).tolist()
+    )
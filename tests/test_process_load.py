@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import src.process_load
+from src.process_load import read_load_profiles
+
+HOURS = pd.date_range("2016-12-31 22:00", "2017-01-02 02:00", freq="h")
+
+
+@pytest.fixture
+def path_to_raw_load(tmpdir):
+    rows = [
+        pd.DataFrame({
+            "region": region,
+            "variable": variable,
+            "attribute": attribute,
+            "utc_timestamp": HOURS.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "unused": "-",
+            "data": value
+        })
+        for region, variable, attribute, value in [
+            ("DE", "load", "entsoe_power_statistics", 10.0),
+            ("DE", "load", "entsoe_transparency", 20.0),
+            ("DE", "price", "entsoe_transparency", 30.0),
+            ("FR", "load", "entsoe_power_statistics", 40.0),
+            ("CH", "load", "entsoe_transparency", 50.0)
+        ]
+    ]
+    path = tmpdir.join("raw-load.csv")
+    pd.concat(rows).sample(frac=1, random_state=0).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("rows_per_chunk", [7, 1000])
+def test_load_profiles_independent_of_chunks(path_to_raw_load, rows_per_chunk, monkeypatch):
+    monkeypatch.setattr(src.process_load, "ROWS_PER_CHUNK", rows_per_chunk)
+    load = read_load_profiles(path_to_raw_load, datetime(2017, 1, 1), datetime(2017, 1, 2), ["DE", "FR"])
+    assert load.columns.tolist() == ["DEU", "FRA"]
+    assert load.index.tolist() == list(pd.date_range("2017-01-01", periods=24, freq="h"))
+    assert (load["DEU"] == 20.0).all() # entsoe transparency preferred
+    assert (load["FRA"] == 40.0).all()
@@ -0,0 +1,88 @@
+import numpy as np
+import geopandas as gpd
+import pytest
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+import shapely.geometry
+
+import src.protected_areas
+from src.potentials import ProtectedArea
+from src.protected_areas import _read_protected_areas, _write_protected_areas, _rasterise_tile
+
+
+@pytest.mark.parametrize("iucn_category,protected_area", [
+    ("Ia", ProtectedArea.IUCN_IA),
+    ("II", ProtectedArea.IUCN_II),
+    ("VI", ProtectedArea.IUCN_VI),
+    ("Not Reported", ProtectedArea.NOT_REPORTED),
+    ("Not Assigned", ProtectedArea.NOT_ASSIGNED),
+    (None, ProtectedArea.NOT_REPORTED)
+])
+def test_protected_area_from_iucn_category(iucn_category, protected_area):
+    assert ProtectedArea.from_iucn_category(iucn_category) == protected_area
+
+
+def test_all_categories_are_protected():
+    protected_areas = np.array([category.value for category in ProtectedArea], dtype=np.uint8)
+    assert ProtectedArea.is_protected(protected_areas).tolist() == [False] + [True] * (len(protected_areas) - 1)
+
+
+@pytest.fixture
+def path_to_protected_areas(tmpdir):
+    path = str(tmpdir.join("protected-areas.geojson"))
+    gpd.GeoDataFrame(
+        {
+            "STATUS": ["Designated", "Designated", "Proposed", "Designated", "Inscribed"],
+            "DESIG_ENG": [None, "National Park", None, "UNESCO-MAB Biosphere Reserve", None],
+            "IUCN_CAT": ["II", "Ia", "II", "II", "VI"]
+        },
+        geometry=[shapely.geometry.box(x, 0, x + 0.5, 0.5) for x in range(4)] + [
+            shapely.geometry.MultiPolygon([shapely.geometry.box(4, 0, 4.5, 0.5), shapely.geometry.box(4.6, 0, 4.9, 0.5)])
+        ],
+        crs="EPSG:4326"
+    ).to_file(path, driver="GeoJSON")
+    return path
+
+
+@pytest.fixture
+def path_to_written(tmpdir, path_to_protected_areas):
+    def write(bounds):
+        path = str(tmpdir.join("protected-areas.gpkg"))
+        _write_protected_areas([path_to_protected_areas], bounds, "EPSG:4326", path)
+        return path
+    return write
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 100])
+def test_write_protected_areas_in_batches(path_to_written, monkeypatch, batch_size):
+    monkeypatch.setattr(src.protected_areas, "BATCH_SIZE", batch_size)
+    shapes, categories = _read_protected_areas(path_to_written([-1, -1, 10, 10]), bounds=[-1, -1, 10, 10])
+    assert categories.tolist() == [ProtectedArea.IUCN_VI, ProtectedArea.IUCN_II, ProtectedArea.IUCN_IA]
+    assert [shape.bounds[0] for shape in shapes] == [4, 0, 1]
+
+
+def test_write_protected_areas_in_bounds(path_to_written):
+    shapes, _ = _read_protected_areas(path_to_written([0.8, -1, 10, 10]), bounds=[-1, -1, 10, 10])
+    assert [shape.bounds[0] for shape in shapes] == [4, 1]
+
+
+def test_read_protected_areas_of_tile(path_to_written):
+    shapes, categories = _read_protected_areas(path_to_written([-1, -1, 10, 10]), bounds=[0.6, 0, 1.4, 1])
+    assert categories.tolist() == [ProtectedArea.IUCN_IA]
+    assert [shape.bounds[0] for shape in shapes] == [1]
+
+
+def test_no_protected_areas(path_to_written):
+    shapes, categories = _read_protected_areas(path_to_written([20, 20, 30, 30]), bounds=[-1, -1, 10, 10])
+    assert shapes.size == 0
+    assert categories.size == 0
+
+
+def test_rasterise_tile(path_to_written):
+    path = path_to_written([-1, -1, 10, 10])
+    tile = Window(0, 0, 5, 1)
+    data = _rasterise_tile((path, tile, from_origin(0, 0.5, 1, 0.5), (0, 0, 5, 0.5)))
+    assert data.tolist() == [[
+        ProtectedArea.IUCN_II, ProtectedArea.IUCN_IA, ProtectedArea.NOT_PROTECTED,
+        ProtectedArea.NOT_PROTECTED, ProtectedArea.IUCN_VI
+    ]]
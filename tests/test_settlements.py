@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from click.testing import CliRunner
+
+import src.settlements
+from src.settlements import settlements
+from src.conversion import transform_points
+
+SHARES = {50: 0.05, 40: 0.1, 41: 0.2, 45: 0.3, 30: 0.15, 35: 0.25}
+SOURCE_TRANSFORM = from_origin(4260000, 2850000, 1000, 1000) # covers the reference in EPSG:3035
+SOURCE_SHAPE = (170, 120)
+
+
+@pytest.fixture
+def path_to_reference(tmpdir):
+    path = str(tmpdir.join("reference.tif"))
+    with rasterio.open(path, "w", driver="GTiff", height=100, width=100, count=1, dtype=np.uint8,
+                       crs="EPSG:4326", transform=from_origin(9.5, 48.5, 0.01, 0.01)) as dst:
+        dst.write(np.zeros((100, 100), dtype=np.uint8), 1)
+    return path
+
+
+def _write_classes(tmpdir, gradient):
+    paths = {}
+    rows = np.linspace(0, 1, SOURCE_SHAPE[0])[:, np.newaxis] * np.ones(SOURCE_SHAPE)
+    for esm_class, share in SHARES.items():
+        paths[esm_class] = str(tmpdir.join(f"class{esm_class}.tif"))
+        data = share * rows if gradient else np.full(SOURCE_SHAPE, share)
+        with rasterio.open(paths[esm_class], "w", driver="GTiff", height=SOURCE_SHAPE[0],
+                           width=SOURCE_SHAPE[1], count=1, dtype=np.float32, crs="EPSG:3035",
+                           transform=SOURCE_TRANSFORM, nodata=-1) as dst:
+            dst.write(data.astype(np.float32), 1)
+    return paths
+
+
+def _run(tmpdir, paths, path_to_reference, name):
+    outputs = [str(tmpdir.join(f"{name}-{output}.tif")) for output in ["buildings", "greens", "built-up"]]
+    result = CliRunner().invoke(
+        settlements,
+        [paths[esm_class] for esm_class in [50, 40, 41, 45, 30, 35]] + [path_to_reference] + outputs
+    )
+    assert result.exit_code == 0, result.output
+    data = []
+    for output in outputs:
+        with rasterio.open(output, "r") as src:
+            data.append(src.read(1))
+    return data
+
+
+def test_sums_of_classes_preserved(tmpdir, path_to_reference):
+    buildings, urban_greens, built_up = _run(tmpdir, _write_classes(tmpdir, gradient=False),
+                                             path_to_reference, "constant")
+    assert buildings == pytest.approx(np.full((100, 100), 0.05), abs=1e-6)
+    assert urban_greens == pytest.approx(np.full((100, 100), 0.6), abs=1e-6)
+    assert built_up == pytest.approx(np.full((100, 100), 0.45), abs=1e-6)
+
+
+@pytest.mark.parametrize("tile_size", [16, 256])
+def test_result_independent_of_tiles(tmpdir, path_to_reference, monkeypatch, tile_size):
+    # shares rise linearly from north to south in the source, which bilinear resampling retains
+    monkeypatch.setattr(src.settlements, "TILE_SIZE", tile_size)
+    _, urban_greens, _ = _run(tmpdir, _write_classes(tmpdir, gradient=True), path_to_reference, "gradient")
+    lon, lat = np.meshgrid(9.5 + (np.arange(100) + 0.5) * 0.01, 48.5 - (np.arange(100) + 0.5) * 0.01)
+    _, y = transform_points(lon.ravel(), lat.ravel(), "EPSG:4326", "EPSG:3035")
+    source_row = (SOURCE_TRANSFORM.f - y) / 1000 - 0.5
+    expected = 0.6 * source_row / (SOURCE_SHAPE[0] - 1)
+    # GDAL approximates the transformation within 0.125 source pixels
+    assert urban_greens.ravel() == pytest.approx(expected, abs=1e-3)
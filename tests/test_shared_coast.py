@@ -0,0 +1,91 @@
+import pandas as pd
+import geopandas as gpd
+import pytest
+import shapely.geometry
+from click.testing import CliRunner
+
+from src.shared_coast import allocate_to_units, allocate_eezs
+
+
+@pytest.fixture
+def path_to_shared_coast(tmpdir):
+    path = str(tmpdir.join("shared-coast.csv"))
+    pd.DataFrame({
+        "id": ["A", "B", "C"],
+        "eez": [1, 1, 2],
+        "share": [0.25, 0.75, 1.0]
+    }).to_csv(path, header=True, index=False)
+    return path
+
+
+def test_allocate_to_units(path_to_shared_coast):
+    eez_data = pd.DataFrame({"potential": [100.0, 10.0, 0.0]}, index=[1, 2, 3])
+    allocated = allocate_to_units(path_to_shared_coast, eez_data, unit_ids=["A", "B", "C", "D"])
+    assert allocated["potential"].tolist() == [25.0, 75.0, 10.0, 0.0]
+
+
+def test_allocate_to_units_fails_for_eez_without_coast(path_to_shared_coast):
+    eez_data = pd.DataFrame({"potential": [100.0, 10.0, 1.0]}, index=[1, 2, 3])
+    with pytest.raises(ValueError, match="Eezs 3 have non-zero data"):
+        allocate_to_units(path_to_shared_coast, eez_data, unit_ids=["A", "B", "C", "D"])
+
+
+def test_allocate_to_units_preserves_order_of_units(path_to_shared_coast):
+    eez_data = pd.DataFrame({"potential": [100.0, 10.0]}, index=[1, 2])
+    allocated = allocate_to_units(path_to_shared_coast, eez_data, unit_ids=["D", "C", "B", "A"])
+    assert allocated.index.tolist() == ["D", "C", "B", "A"]
+    assert allocated["potential"].tolist() == [0.0, 10.0, 75.0, 25.0]
+
+
+def _allocate_eezs(tmpdir, units, eez, mode, expect_success=True):
+    path_to_units = str(tmpdir.join("units.parquet"))
+    path_to_eezs = str(tmpdir.join("eezs.geojson"))
+    path_to_output = str(tmpdir.join(f"shared-coast-{mode}.csv"))
+    gpd.GeoDataFrame(
+        {"id": list(units.keys()), "country_code": "DEU"},
+        geometry=list(units.values()),
+        crs="EPSG:4326"
+    ).to_parquet(path_to_units)
+    gpd.GeoDataFrame(
+        {"MRGID": [1], "ISO_Ter1": ["DEU"], "GeoName": ["eez"], "Area_km2": [100.0]},
+        geometry=[eez],
+        crs="EPSG:4326"
+    ).to_file(path_to_eezs, driver="GeoJSON")
+    result = CliRunner().invoke(allocate_eezs, [path_to_units, path_to_eezs, path_to_output, "1", f"--{mode}"])
+    if not expect_success:
+        return result
+    assert result.exit_code == 0, result.output
+    return pd.read_csv(path_to_output, index_col="id")["share"]
+
+
+def test_linework_close_to_exact(tmpdir):
+    units = { # coast of A is half as long as coast of B
+        "A": shapely.geometry.box(0, 0, 1, 1),
+        "B": shapely.geometry.box(0, 1, 1, 3)
+    }
+    eez = shapely.geometry.box(1, 0, 3, 3)
+    linework = _allocate_eezs(tmpdir, units, eez, "linework")
+    exact = _allocate_eezs(tmpdir, units, eez, "exact")
+    assert exact.to_dict() == pytest.approx({"A": 1 / 3, "B": 2 / 3})
+    assert linework.to_dict() == pytest.approx(exact.to_dict(), abs=0.01)
+
+
+def test_linework_falls_back_to_exact_for_islands(tmpdir):
+    units = { # islands within the eez, far away from its boundary
+        "A": shapely.geometry.box(2, 2, 3, 3),
+        "B": shapely.geometry.box(5, 5, 7, 7)
+    }
+    eez = shapely.geometry.box(0, 0, 10, 10)
+    linework = _allocate_eezs(tmpdir, units, eez, "linework")
+    exact = _allocate_eezs(tmpdir, units, eez, "exact")
+    assert linework.to_dict() == pytest.approx({"A": 1 / 3, "B": 2 / 3})
+    assert linework.to_dict() == pytest.approx(exact.to_dict())
+
+
+@pytest.mark.parametrize("mode", ["linework", "exact"])
+def test_eez_without_units_fails(tmpdir, mode):
+    units = {"A": shapely.geometry.box(0, 0, 1, 1)}
+    eez = shapely.geometry.box(5, 5, 6, 6)
+    result = _allocate_eezs(tmpdir, units, eez, mode, expect_success=False)
+    assert isinstance(result.exception, ValueError)
+    assert "No shared coast found for eez" in str(result.exception)
@@ -0,0 +1,70 @@
+import math
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from click.testing import CliRunner
+
+import src.slope
+from src.slope import slope, _horn_slope, _target_indices
+
+
+def test_slope_of_plane():
+    elevation = np.add.outer(np.zeros(5), np.arange(5) * 10.0) # rises 10m per pixel eastwards
+    slope = _horn_slope(elevation, dx=100.0, dy=100.0)
+    assert slope.shape == (3, 3)
+    assert slope == pytest.approx(np.full((3, 3), math.degrees(math.atan(0.1))), abs=1e-4)
+
+
+def test_no_slope_next_to_missing_data():
+    elevation = np.zeros((5, 5))
+    elevation[0, 0] = np.nan
+    slope = _horn_slope(elevation, dx=100.0, dy=100.0)
+    assert np.isnan(slope[0, 0])
+    assert (slope[1:, 1:] == 0).all()
+
+
+def test_target_indices_of_source_pixel_centres():
+    # 10 source pixels of width 0.3 onto 3 target pixels of width 1
+    indices = _target_indices(10, origin=0, resolution=0.3, target_origin=0, target_resolution=1,
+                              number_target_pixels=3)
+    assert indices.tolist() == [0, 0, 0, 1, 1, 1, 1, 2, 2, 2]
+
+
+def test_target_indices_outside_target():
+    indices = _target_indices(4, origin=10, resolution=-1, target_origin=9, target_resolution=-1,
+                              number_target_pixels=2)
+    assert indices.tolist() == [-1, 0, 1, -1]
+
+
+@pytest.fixture
+def paths_to_grids(tmpdir):
+    path_to_elevation = str(tmpdir.join("elevation.tif"))
+    elevation = np.random.default_rng(seed=42).uniform(0, 1000, size=(40, 50)).astype(np.float32)
+    elevation[5, 7] = -9999
+    with rasterio.open(path_to_elevation, "w", driver="GTiff", height=40, width=50, count=1, dtype=np.float32,
+                       crs="EPSG:4326", transform=from_origin(10, 50, 0.01, 0.01), nodata=-9999) as dst:
+        dst.write(elevation, 1)
+    path_to_reference = str(tmpdir.join("reference.tif"))
+    with rasterio.open(path_to_reference, "w", driver="GTiff", height=11, width=12, count=1, dtype=np.uint8,
+                       crs="EPSG:4326", transform=from_origin(10.005, 49.995, 0.04, 0.04)) as dst:
+        dst.write(np.zeros((11, 12), dtype=np.uint8), 1)
+    return path_to_elevation, path_to_reference
+
+
+def _slope_with_tile_size(tmpdir, paths_to_grids, monkeypatch, tile_size):
+    monkeypatch.setattr(src.slope, "TILE_SIZE", tile_size)
+    path_to_output = str(tmpdir.join("slope-{}.tif".format(tile_size)))
+    result = CliRunner().invoke(slope, [*paths_to_grids, path_to_output])
+    assert result.exit_code == 0, result.output
+    with rasterio.open(path_to_output, "r") as f:
+        return f.read(1)
+
+
+def test_slope_independent_of_tiles(tmpdir, paths_to_grids, monkeypatch):
+    in_one_tile = _slope_with_tile_size(tmpdir, paths_to_grids, monkeypatch, tile_size=100)
+    in_many_tiles = _slope_with_tile_size(tmpdir, paths_to_grids, monkeypatch, tile_size=2)
+    assert (in_one_tile[:-1, :] != src.slope.NODATA).all() # the last row lies outside the elevation data
+    assert (in_one_tile[-1, :] == src.slope.NODATA).all()
+    assert (in_one_tile == in_many_tiles).all()
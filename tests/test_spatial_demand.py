@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+import geopandas as gpd
+import rasterio
+from rasterio.transform import from_origin
+import shapely.geometry
+
+from src.spatial_demand import _match_industry_to_units, _non_industry_load_shapes, _population_per_country, \
+    _match_national_demand, _pixels_of_industry
+from src.technical_eligibility import GlobCover
+
+UNITS = gpd.GeoDataFrame(
+    {"id": ["A", "B"]},
+    geometry=[shapely.geometry.box(0, 0, 1, 1), shapely.geometry.box(1, 0, 2, 1)],
+    crs="EPSG:4326"
+)
+
+
+def _industries(*points):
+    return gpd.GeoDataFrame(
+        geometry=[shapely.geometry.Point(x, y) for x, y in points],
+        crs="EPSG:4326"
+    )
+
+
+def test_industry_within_units():
+    industries = _industries((0.5, 0.5), (1.5, 0.5))
+    assert _match_industry_to_units(industries, UNITS).tolist() == [0, 1]
+
+
+def test_industry_outside_units_matched_to_nearest_unit():
+    industries = _industries((0.5, 1.05), (2.05, 0.5))
+    assert _match_industry_to_units(industries, UNITS).tolist() == [0, 1]
+
+
+def test_industry_far_outside_units():
+    industries = _industries((0.5, 0.5), (5, 5))
+    with pytest.raises(AssertionError):
+        _match_industry_to_units(industries, UNITS)
+
+
+def test_non_industry_load_shapes():
+    national_load = pd.DataFrame({"A": [10.0, 20.0, 30.0], "B": [5.0, 5.0, 5.0]})
+    country_codes = pd.Series(["A", "A", "B"])
+    industry_load = np.array([4.0, 6.0, 1.0])
+    shapes = _non_industry_load_shapes(national_load, industry_load, country_codes, pd.Index(["B", "A"]))
+    assert shapes.shape == (2, 3)
+    assert shapes[0] == pytest.approx([1.0, 1.0, 1.0])
+    assert shapes[1] == pytest.approx([0.0, 1.0, 2.0])
+
+
+def _write_raster(path, data):
+    with rasterio.open(path, "w", driver="GTiff", height=data.shape[0], width=data.shape[1], count=1,
+                       dtype=data.dtype, crs="EPSG:4326", transform=from_origin(0, 1, 0.5, 0.5)) as dst:
+        dst.write(data, 1)
+    return path
+
+
+def test_population_on_water_bodies_ignored(tmpdir):
+    water = GlobCover.WATER_BODIES.value
+    forest = GlobCover.CLOSED_TO_OPEN_BROADLEAVED_FOREST.value
+    population = _population_per_country(
+        path_to_countries_raster=_write_raster(str(tmpdir.join("countries.tif")),
+                                               np.array([[1, 1, 2, 2], [1, 1, 2, 0]], dtype=np.uint32)),
+        path_to_population=_write_raster(str(tmpdir.join("population.tif")),
+                                         np.array([[1, 2, 3, 4], [5, 6, 7, 8]], dtype=np.float32)),
+        path_to_land_cover=_write_raster(str(tmpdir.join("land-cover.tif")),
+                                         np.array([[water, forest, forest, forest],
+                                                   [forest, water, forest, forest]], dtype=np.uint8)),
+        number_countries=2
+    )
+    assert population.tolist() == [7, 14]
+
+
+def test_industry_pixels_in_unit_or_nearest_to_it(tmpdir):
+    units = np.array([[1, 1, 1, 2, 2, 2], [1, 1, 1, 2, 2, 2]], dtype=np.uint32)
+    path_to_units = _write_raster(str(tmpdir.join("units.tif")), units)
+    industries = _industries((0.25, 0.75), (1.6, 0.75), (3.1, 0.25))
+    industries["country_label"] = [1, 1, 2]
+    industries["installation"] = ["in unit", "next to unit", "outside raster"]
+    industries["demand_twh_per_year"] = [1.0, 2.0, 3.0]
+    with rasterio.open(path_to_units, "r") as src:
+        pixels = _pixels_of_industry(industries, src)
+    assert pixels["row"].tolist() == [0, 0, 1]
+    assert pixels["col"].tolist() == [0, 2, 5]
+    assert pixels["demand_twh_per_year"].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_industry_pixels_far_from_unit(tmpdir):
+    units = np.array([[1, 1, 1, 2, 2, 2], [1, 1, 1, 2, 2, 2]], dtype=np.uint32)
+    path_to_units = _write_raster(str(tmpdir.join("units.tif")), units)
+    industries = _industries((2.75, 0.75))
+    industries["country_label"] = [1]
+    industries["installation"] = ["far from unit"]
+    industries["demand_twh_per_year"] = [1.0]
+    with rasterio.open(path_to_units, "r") as src, pytest.raises(AssertionError):
+        _pixels_of_industry(industries, src)
+
+
+def test_match_national_demand():
+    units = pd.DataFrame({"id": ["A1", "A2", "B1"], "country_code": ["A", "A", "B"]})
+    total_demand = pd.DataFrame({"twh_per_year": [12.0, 5.0]}, index=pd.Index(["A", "B"], name="country_code"))
+    non_industry = _match_national_demand(
+        local_non_industry_demand=pd.Series([2.0, 3.0, 4.0]),
+        local_industry_demand=pd.Series([2.0, 0.0, 0.0]),
+        units=units,
+        total_demand=total_demand
+    )
+    assert non_industry.tolist() == pytest.approx([4.0, 6.0, 5.0])
+
+
+def test_match_national_demand_without_local_demand():
+    units = pd.DataFrame({"id": ["A1", "B1"], "country_code": ["A", "B"]})
+    total_demand = pd.DataFrame({"twh_per_year": [10.0, 5.0]}, index=pd.Index(["A", "B"], name="country_code"))
+    with pytest.raises(ValueError, match="B"):
+        _match_national_demand(
+            local_non_industry_demand=pd.Series([2.0, 0.0]),
+            local_industry_demand=pd.Series([0.0, 0.0]),
+            units=units,
+            total_demand=total_demand
+        )
@@ -0,0 +1,69 @@
+import pytest
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from src.units_raster import sum_per_unit, categories_per_unit, pixels_per_unit, DTYPE
+
+LABELS = np.array([
+    [0, 1, 1],
+    [2, 2, 1],
+    [2, 0, 3]
+], dtype=DTYPE)
+VALUES = np.array([
+    [9.0, 1.0, 2.0],
+    [3.0, 4.0, 5.0],
+    [6.0, 9.0, 7.0]
+], dtype=np.float32)
+CATEGORIES = np.array([
+    [11, 11, 14],
+    [14, 14, 99],
+    [11, 11, 11]
+], dtype=np.uint8)
+
+
+def _write_raster(path, data):
+    with rasterio.open(path, "w", driver="GTiff", height=data.shape[0], width=data.shape[1],
+                       count=1, dtype=data.dtype, crs="EPSG:4326",
+                       transform=from_origin(0, 50, 0.1, 0.1)) as dst:
+        dst.write(data, 1)
+    return path
+
+
+@pytest.fixture
+def path_to_units_raster(tmpdir):
+    return _write_raster(str(tmpdir.join("units.tif")), LABELS)
+
+
+@pytest.fixture
+def path_to_values(tmpdir):
+    return _write_raster(str(tmpdir.join("values.tif")), VALUES)
+
+
+@pytest.fixture
+def path_to_categories(tmpdir):
+    return _write_raster(str(tmpdir.join("categories.tif")), CATEGORIES)
+
+
+def test_sum_per_unit(path_to_units_raster, path_to_values):
+    sums = sum_per_unit(path_to_units_raster, path_to_values, number_units=4)
+    assert sums.tolist() == [8.0, 13.0, 7.0, 0.0]
+
+
+def test_pixels_per_unit(path_to_units_raster):
+    assert pixels_per_unit(path_to_units_raster, number_units=4).tolist() == [3, 3, 1, 0]
+
+
+def test_categories_per_unit(path_to_units_raster, path_to_categories):
+    counts = categories_per_unit(path_to_units_raster, path_to_categories, categories=[11, 14],
+                                 number_units=3)
+    assert counts.tolist() == [[1, 1], [1, 2], [1, 0]]
+
+
+def test_area_weighted_categories_per_unit(path_to_units_raster, path_to_categories):
+    counts = categories_per_unit(path_to_units_raster, path_to_categories, categories=[11, 14],
+                                 number_units=3)
+    areas = categories_per_unit(path_to_units_raster, path_to_categories, categories=[11, 14],
+                                number_units=3, area_weighted=True)
+    assert (areas[counts > 0] > 0).all()
+    assert (areas[counts == 0] == 0).all()
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+import shapely.geometry
+
+from src.utils import read_window_of_geometry, read_window_of_unit, apply_sub_scope
+
+DATA = np.arange(100, dtype=np.int32).reshape(10, 10)
+TRANSFORM = from_origin(0, 10, 1, 1)
+
+
+@pytest.fixture
+def path_to_raster(tmpdir):
+    path = str(tmpdir.join("raster.tif"))
+    with rasterio.open(path, "w", driver="GTiff", height=10, width=10, count=1, dtype=DATA.dtype,
+                       crs="EPSG:4326", transform=TRANSFORM) as dst:
+        dst.write(DATA, 1)
+    return path
+
+
+def test_window_covers_geometry(path_to_raster):
+    data, transform = read_window_of_geometry(path_to_raster, shapely.geometry.box(2.5, 6.5, 4.5, 7.5))
+    assert (data == DATA[2:4, 2:5]).all()
+    assert transform.almost_equals(from_origin(2, 8, 1, 1))
+
+
+def test_window_clipped_to_raster(path_to_raster):
+    data, transform = read_window_of_geometry(path_to_raster, shapely.geometry.box(-5, -5, 1, 1))
+    assert (data == DATA[9:, :1]).all()
+    assert transform.almost_equals(from_origin(0, 1, 1, 1))
+
+
+def test_window_covers_unit(path_to_raster, tmpdir):
+    path_to_attributes = str(tmpdir.join("unit-attributes.csv"))
+    pd.DataFrame(
+        {"x_min": [0, 5], "y_min": [0, 0], "x_max": [5, 10], "y_max": [10, 5]},
+        index=pd.Index(["A", "B"], name="id")
+    ).to_csv(path_to_attributes)
+    data, _ = read_window_of_unit(path_to_raster, path_to_attributes, "B")
+    assert (data == DATA[5:, 5:]).all()
+
+
+CONFIG = {
+    "scope": {
+        "countries": ["Germany", "Switzerland"],
+        "bounds": {"x_min": 0, "x_max": 20, "y_min": 40, "y_max": 60}
+    },
+    "layers": {
+        "national": {"Germany": "nuts0", "Switzerland": "nuts0"},
+        "regional": {"Germany": "nuts2", "Switzerland": "gadm1"}
+    }
+}
+
+
+def test_without_sub_scope_config_remains_unchanged():
+    assert apply_sub_scope(CONFIG) == CONFIG
+
+
+def test_sub_scope_restricts_scope_and_layers():
+    config = dict(CONFIG, **{
+        "sub-scope": {
+            "countries": ["Switzerland"],
+            "bounds": {"x_min": 5, "x_max": 11, "y_min": 45, "y_max": 48}
+        }
+    })
+    sub_scoped = apply_sub_scope(config)
+    assert sub_scoped["scope"]["countries"] == ["Switzerland"]
+    assert sub_scoped["scope"]["bounds"] == {"x_min": 5, "x_max": 11, "y_min": 45, "y_max": 48}
+    assert sub_scoped["layers"] == {"national": {"Switzerland": "nuts0"}, "regional": {"Switzerland": "gadm1"}}
+    assert apply_sub_scope(sub_scoped) == sub_scoped
+    assert config["scope"] == CONFIG["scope"] # original config remains unchanged
+
+
+def test_sub_scope_outside_of_scope():
+    config = dict(CONFIG, **{
+        "sub-scope": {
+            "countries": ["Switzerland"],
+            "bounds": {"x_min": 5, "x_max": 25, "y_min": 45, "y_max": 48}
+        }
+    })
+    with pytest.raises(AssertionError):
+        apply_sub_scope(config)